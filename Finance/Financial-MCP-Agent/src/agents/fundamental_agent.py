@@ -1,44 +1,264 @@
 """
-FundamentalAnalysis Agent: Performs fundamental analysis of a stock using ReAct Agent framework.
-基本面分析 Agent：使用ReAct Agent框架对股票进行基本面分析
+FundamentalAnalysis Agent: Performs fundamental analysis of a stock using native LLM tool calling.
+基本面分析 Agent：使用原生工具调用（tool calling）循环对股票进行基本面分析
 """
+from __future__ import annotations
+
 import os
-import json
-from typing import Dict, Any, List, Optional
-from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.outputs import ChatResult, ChatGeneration
-from langgraph.prebuilt import create_react_agent
+import asyncio
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, ToolMessage
 import time
+import logging
+from datetime import datetime
 
 from src.utils.state_definition import AgentState
-from src.tools.mcp_client import get_mcp_tools
 from src.utils.logging_config import setup_logger, ERROR_ICON, SUCCESS_ICON, WAIT_ICON
-from src.utils.execution_logger import get_execution_logger
-from dotenv import load_dotenv
-
-# 从.env文件加载环境变量
-load_dotenv(override=True)
+from src.utils.execution_logger import get_execution_logger, log_in_background
+from src.utils.llm_config import llm_cfg, get_chat_llm
+from src.utils.analysis_cache import AnalysisCache, make_cache_key
 
 logger = setup_logger(__name__)
 
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_openai import ChatOpenAI
+
+# 工具调用循环的最大轮数（对应LangGraph ReAct默认递归上限25个节点，约12轮模型调用）
+MAX_TOOL_STEPS = 12
+
+# 基本面分析请求模板：固定的分析维度和要求放在前面，只有最后一行随股票和时间变化，
+# 使请求前缀在多次调用间保持一致，便于模型服务端的提示词缓存命中
+FUNDAMENTAL_PROMPT_TEMPLATE = """请对指定股票进行基本面分析。
+维度：公司概况与行业；最新三大报表（资产负债表、利润表、现金流量表）；盈利能力（毛利率、净利率、ROE）；成长能力（收入、利润增长率）；运营效率（应收、存货周转率）；偿债能力（资产负债率、流动比率）；历史分红；综合评估与投资价值。
+要求：用工具获取真实数据，不作假设；彼此独立的数据在同一轮并行调用多个工具；数据缺失时换报告期或工具重试。
+分析对象：{company_name}（{stock_code}）。当前时间：{current_time_info}，分析基准日期：{current_date}。"""
+
+# 提示词版本号，修改分析请求模板后递增以使旧的分析结果缓存失效
+PROMPT_VERSION = "v2"
+
+# 基本面分析结果缓存（同一股票、同一分析日期直接复用结果）
+analysis_cache = AnalysisCache("fundamental_agent")
+
+# 基本面分析不应使用的工具，绑定前直接从工具列表中移除
+FORBIDDEN_TOOLS = {"crawl_news"}
+
+# 单只股票工具调用循环的整体超时时间（秒），避免个别工具卡住导致整个流程无限等待
+AGENT_TIMEOUT_SECONDS = 180.0
+
+# 批量分析时同时运行的最大股票数，避免触发模型服务商的速率限制
+BATCH_CONCURRENCY = 4
+
+# LLM生成参数
+LLM_TEMPERATURE = 0.3  # 较低的温度确保分析的一致性
+LLM_MAX_TOKENS = 6000  # 增加token数量用于详细分析
+
+
+def _compact_tool_schema(tool: Any) -> Dict[str, Any]:
+    """
+    将工具转换为精简的OpenAI函数schema
+
+    MCP工具的描述是完整的docstring（参数、返回值说明），每轮请求都会随工具列表重复发送。
+    这里只保留首行摘要，并去掉参数schema中冗余的title字段，以减少每次调用的输入token。
+    """
+    # 较重的依赖（工具格式转换、MCP适配器）在使用时才导入，缩短模块加载时间
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    schema = convert_to_openai_tool(tool)
+    function = schema["function"]
+    summary_lines = [line.strip() for line in (tool.description or "").splitlines() if line.strip()]
+    function["description"] = summary_lines[0] if summary_lines else tool.name
+    parameters = function.get("parameters", {})
+    parameters.pop("title", None)
+    for prop in parameters.get("properties", {}).values():
+        prop.pop("title", None)
+    return schema
+
+
+async def _execute_tool_call(tool_map: Dict[str, Any], tool_call: Dict[str, Any], agent_name: str) -> ToolMessage:
+    """
+    执行模型请求的单个工具调用，并将结果包装为ToolMessage
+
+    工具不存在或执行失败时不会抛出异常，而是把错误信息作为工具结果返回给模型，
+    与LangGraph ToolNode的默认错误处理行为保持一致。
+    """
+    execution_logger = get_execution_logger()
+    tool_name = tool_call["name"]
+    tool_args = tool_call.get("args", {})
+    start_time = time.perf_counter()
+
+    tool = tool_map.get(tool_name)
+    if tool is None:
+        error = f"Tool '{tool_name}' is not available."
+        logger.warning(f"{ERROR_ICON} {error}")
+        log_in_background(execution_logger.log_tool_usage,
+            agent_name, tool_name, tool_args, None, 0, False, error)
+        return ToolMessage(content=f"Error: {error}", name=tool_name,
+                           tool_call_id=tool_call["id"], status="error")
+
+    try:
+        # 传入完整的tool_call，LangChain会直接返回对应tool_call_id的ToolMessage
+        tool_message = await tool.ainvoke(tool_call)
+        log_in_background(execution_logger.log_tool_usage,
+            agent_name, tool_name, tool_args, tool_message.content, time.perf_counter() - start_time)
+        return tool_message
+    except Exception as e:
+        logger.error(f"{ERROR_ICON} Tool '{tool_name}' failed: {e}")
+        log_in_background(execution_logger.log_tool_usage,
+            agent_name, tool_name, tool_args, None, time.perf_counter() - start_time, False, str(e))
+        return ToolMessage(content=f"Error: {e}", name=tool_name,
+                           tool_call_id=tool_call["id"], status="error")
+
+
+async def _stream_model_response(llm: Any, messages: List[BaseMessage]) -> AIMessage:
+    """
+    以流式方式获取模型回复
+
+    流式块会被累加为完整的AI消息，工具调用信息也随之合并，
+    因此返回值与一次性调用ainvoke得到的消息等价。
+    """
+    response = None
+    async for chunk in llm.astream(messages):
+        response = chunk if response is None else response + chunk
+    return response if response is not None else AIMessage(content="")
+
+
+async def _run_tool_calling_loop(llm: BaseChatModel, tools: List[Any], messages: List[BaseMessage],
+                                 agent_name: str) -> List[BaseMessage]:
+    """
+    基于原生工具调用的分析循环
+
+    每一轮只发起一次LLM请求：模型在同一条回复中给出推理内容和工具调用（tool_choice="auto"），
+    不再像ReAct预制Agent那样把思考和行动拆成两次补全。同一条回复中的多个工具调用彼此独立，
+    使用asyncio.gather并发执行，结果按原始顺序追加。回复中没有工具调用时即视为最终分析。
+
+    Args:
+        llm: 聊天模型实例
+        tools: MCP工具列表
+        messages: 初始消息列表，循环中会原地追加AI消息和工具结果
+        agent_name: Agent名称，用于记录工具使用日志
+
+    Returns:
+        完整的消息列表，最后一条为包含最终分析的AI消息
+    """
+    tool_map = {tool.name: tool for tool in tools}
+    tool_schemas = [_compact_tool_schema(tool) for tool in tools]
+    llm_with_tools = llm.bind_tools(tool_schemas, tool_choice="auto")
+
+    for step in range(1, MAX_TOOL_STEPS + 1):
+        response = await _stream_model_response(llm_with_tools, messages)
+        messages.append(response)
+
+        if not response.tool_calls:
+            break
+
+        logger.info(
+            f"Step {step}: model requested tools {[tc['name'] for tc in response.tool_calls]}")
+        # 并发执行本轮的全部工具调用，耗时由最慢的一个决定而不是逐个累加
+        tool_messages = await asyncio.gather(
+            *[_execute_tool_call(tool_map, tool_call, agent_name) for tool_call in response.tool_calls])
+        messages.extend(tool_messages)
+    else:
+        # 达到最大轮数仍在调用工具，禁止继续调用并要求模型基于已有数据给出分析
+        logger.warning(
+            f"Reached {MAX_TOOL_STEPS} tool steps, requesting final answer without tools")
+        final_llm = llm.bind_tools(tool_schemas, tool_choice="none")
+        messages.append(await _stream_model_response(final_llm, messages))
+
+    return messages
+
+
+def _create_llm() -> Optional[ChatOpenAI]:
+    """
+    根据环境变量获取LLM实例
+
+    Returns:
+        ChatOpenAI实例；缺少必要的环境变量时返回None
+    """
+    # 验证必要的环境变量是否存在
+    if not llm_cfg().is_complete:
+        return None
+
+    return get_chat_llm(LLM_TEMPERATURE, LLM_MAX_TOKENS)
+
+
+async def _load_mcp_tools() -> List[Any]:
+    """
+    获取MCP工具集，获取失败时返回空列表，由调用方按"无可用工具"处理
+    """
+    from src.tools.mcp_client import get_mcp_tools
+
+    logger.info(f"{WAIT_ICON} FundamentalAgent: Fetching MCP tools...")
+    try:
+        return await get_mcp_tools()
+    except Exception as e:
+        logger.error(
+            f"{ERROR_ICON} FundamentalAgent: Failed to fetch MCP tools: {e}", exc_info=True)
+        return []
+
 
 async def fundamental_agent(state: AgentState) -> AgentState:
     """
-    使用ReAct框架进行基本面分析，直接集成MCP工具
+    使用原生工具调用循环进行基本面分析，直接集成MCP工具
     
     Args:
         state: 包含用户查询的当前 Agent状态
 
+    Returns:
+        更新后的AgentState，包含基本面分析结果
+    """
+    # 先获取（已缓存的）工具列表，无可用工具时不必创建LLM
+    mcp_tools = await _load_mcp_tools()
+    llm = _create_llm() if mcp_tools else None
+    return await fundamental_agent_core(state, llm, mcp_tools)
+
+
+async def fundamental_agent_batch(states: List[AgentState],
+                                  max_concurrency: int = BATCH_CONCURRENCY) -> List[AgentState]:
+    """
+    并发分析多只股票的基本面
+
+    所有股票共享同一个LLM客户端和MCP工具列表，只初始化一次；
+    通过信号量限制同时进行的分析数量。
+
+    Args:
+        states: 每只股票对应的AgentState
+        max_concurrency: 最大并发数
+
+    Returns:
+        与输入顺序一致的分析结果列表
+    """
+    # 先获取（已缓存的）工具列表，无可用工具时不必创建LLM
+    mcp_tools = await _load_mcp_tools()
+    llm = _create_llm() if mcp_tools else None
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(state: AgentState) -> AgentState:
+        async with semaphore:
+            return await fundamental_agent_core(state, llm, mcp_tools)
+
+    return await asyncio.gather(*(_run(state) for state in states))
+
+
+async def fundamental_agent_core(state: AgentState, llm: Optional[ChatOpenAI],
+                                 mcp_tools: List[Any]) -> AgentState:
+    """
+    基本面分析核心流程，使用调用方预先创建的LLM和MCP工具
+
+    Args:
+        state: 包含用户查询的当前 Agent状态
+        llm: LLM实例，为None表示缺少必要的环境变量（无可用工具时调用方也可不创建）
+        mcp_tools: MCP工具列表
+
     Returns:
         更新后的AgentState，包含基本面分析结果
     """
     logger.info(
-        f"{WAIT_ICON} FundamentalAgent: Starting fundamental analysis using ReAct framework.")
+        f"{WAIT_ICON} FundamentalAgent: Starting fundamental analysis using tool calling.")
 
     # 获取执行日志记录器，用于记录 Agent的执行过程
+    # 日志通过 log_in_background 在后台按顺序写入，不阻塞分析流程；
+    # 传入的 current_data 使用副本，避免写入时数据已被后续流程修改
     execution_logger = get_execution_logger()
     agent_name = "fundamental_agent"
 
@@ -47,12 +267,16 @@ async def fundamental_agent(state: AgentState) -> AgentState:
     current_messages = state.get("messages", [])
     current_metadata = state.get("metadata", {})
     user_query = current_data.get("query")
+    stock_code = current_data.get("stock_code", "Unknown")
+    company_name = current_data.get("company_name", "Unknown")
+    current_time_info = current_data.get("current_time_info", "未知时间")
+    current_date = current_data.get("current_date", "未知日期")
 
     # 记录 Agent开始执行，包含关键信息
-    execution_logger.log_agent_start(agent_name, {
+    log_in_background(execution_logger.log_agent_start, agent_name, {
         "user_query": user_query,
-        "stock_code": current_data.get("stock_code"),
-        "company_name": current_data.get("company_name"),
+        "stock_code": stock_code,
+        "company_name": company_name,
         "input_data_keys": list(current_data.keys())
     })
 
@@ -63,55 +287,65 @@ async def fundamental_agent(state: AgentState) -> AgentState:
         current_data["fundamental_analysis_error"] = "User query is missing."
 
         # 记录 Agent执行失败
-        execution_logger.log_agent_complete(
-            agent_name, current_data, 0, False, "User query is missing")
+        log_in_background(execution_logger.log_agent_complete,
+            agent_name, dict(current_data), 0, False, "User query is missing")
 
         return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
 
     # 记录 Agent开始时间，用于计算执行时长
-    agent_start_time = time.time()
+    agent_start = time.perf_counter()
+
+    # 同一股票、同一分析日期已有分析结果时直接复用，跳过LLM和MCP工具调用
+    cache_key = None
+    if stock_code != "Unknown" and current_date != "未知日期":
+        cache_key = make_cache_key(stock_code, current_date, PROMPT_VERSION)
+        cached_analysis = await asyncio.to_thread(analysis_cache.get, cache_key)
+        if cached_analysis is not None:
+            logger.info(
+                f"{SUCCESS_ICON} FundamentalAgent: Using cached fundamental analysis.")
+            current_data["fundamental_analysis"] = cached_analysis
+            current_metadata["fundamental_agent_executed"] = True
+            current_metadata["fundamental_agent_cached"] = True
+            current_metadata["fundamental_agent_timestamp"] = datetime.now().isoformat()
 
-    try:
-        # 使用API调用
-        api_key = os.getenv("OPENAI_COMPATIBLE_API_KEY")
-        base_url = os.getenv("OPENAI_COMPATIBLE_BASE_URL")
-        model_name = os.getenv("OPENAI_COMPATIBLE_MODEL")
+            total_execution_time = time.perf_counter() - agent_start
+            log_in_background(execution_logger.log_agent_complete, agent_name, {
+                "fundamental_analysis_length": len(cached_analysis),
+                "cache_hit": True,
+                "total_execution_time": total_execution_time
+            }, total_execution_time, True)
 
-        # 验证必要的环境变量是否存在
-        if not all([api_key, base_url, model_name]):
+            return {
+                "data": current_data,
+                "messages": current_messages + [{"role": "assistant", "content": "基本面分析已完成"}],
+                "metadata": current_metadata
+            }
+
+    try:
+        # 检查MCP工具集，移除基本面分析不应使用的工具
+        mcp_tools = [tool for tool in mcp_tools if tool.name not in FORBIDDEN_TOOLS]
+        if not mcp_tools:
             logger.error(
-                f"{ERROR_ICON} FundamentalAgent: Missing OpenAI environment variables.")
-            current_data["fundamental_analysis_error"] = "Missing OpenAI environment variables."
+                f"{ERROR_ICON} FundamentalAgent: No MCP tools available.")
+            current_data["fundamental_analysis_error"] = "No MCP tools available."
 
             # 记录 Agent执行失败
-            execution_logger.log_agent_complete(agent_name, current_data, time.time(
-            ) - agent_start_time, False, "Missing OpenAI environment variables")
+            log_in_background(execution_logger.log_agent_complete,
+                agent_name, dict(current_data), time.perf_counter() - agent_start, False, "No MCP tools available")
 
             return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
 
-        logger.info(
-            f"{WAIT_ICON} FundamentalAgent: Creating ChatOpenAI with model {model_name}")
-        # 创建LLM实例，设置合适的参数
-        llm = ChatOpenAI(
-            model=model_name,
-            api_key=api_key,
-            base_url=base_url,
-            temperature=0.3,  # 较低的温度确保分析的一致性
-            max_tokens=6000   # 增加token数量用于详细分析
-        )
-
-        # 2. 获取MCP工具集
-        logger.info(f"{WAIT_ICON} FundamentalAgent: Fetching MCP tools...")
+        # 2. 验证LLM是否可用（缺少环境变量时为None）
         try:
-            mcp_tools = await get_mcp_tools()
-            if not mcp_tools:
+            if llm is None:
                 logger.error(
-                    f"{ERROR_ICON} FundamentalAgent: No MCP tools available.")
-                current_data["fundamental_analysis_error"] = "No MCP tools available."
+                    f"{ERROR_ICON} FundamentalAgent: Missing OpenAI environment variables.")
+                current_data["fundamental_analysis_error"] = "Missing OpenAI environment variables."
 
                 # 记录 Agent执行失败
-                execution_logger.log_agent_complete(agent_name, current_data, time.time(
-                ) - agent_start_time, False, "No MCP tools available")
+                log_in_background(execution_logger.log_agent_complete,
+                    agent_name, dict(current_data), time.perf_counter() - agent_start, False,
+                    "Missing OpenAI environment variables")
 
                 return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
 
@@ -122,97 +356,79 @@ async def fundamental_agent(state: AgentState) -> AgentState:
             tool_names = [tool.name for tool in mcp_tools]
             logger.info(f"Available tools: {tool_names}")
 
-            # 3. 创建ReAct Agent - 只传入LLM和工具
-            logger.info(
-                f"{WAIT_ICON} FundamentalAgent: Creating ReAct agent...")
-            agent = create_react_agent(llm, mcp_tools)
-
-            # 4. 准备输入数据，构建详细的分析请求
-            stock_code = current_data.get('stock_code', 'Unknown')
-            company_name = current_data.get('company_name', 'Unknown')
-            current_time_info = current_data.get('current_time_info', '未知时间')
-            current_date = current_data.get('current_date', '未知日期')
-
-            # 构建详细的基本面分析请求，包含多个分析维度
-            agent_input = f"""请分析{company_name}（股票代码：{stock_code}）的基本面情况。
-
-当前时间：{current_time_info}
-当前日期：{current_date}
-
-请进行以下基本面分析：
-1. 获取公司基本信息和行业背景
-2. 获取最新财务报表数据（资产负债表、利润表、现金流量表）
-3. 分析盈利能力指标（毛利率、净利率、ROE等）
-4. 分析成长能力指标（收入增长率、利润增长率等）
-5. 分析运营效率指标（应收周转率、存货周转率等）
-6. 分析偿债能力指标（资产负债率、流动比率等）
-7. 查询历史分红情况
-8. 提供基本面综合评估和投资价值分析
-
-重要限制：请专注于财务数据和基本面指标分析，不要使用crawl_news工具获取新闻信息。基本面分析应该基于财务报表、财务指标和公司基本面数据，而不是新闻事件。
-
-请使用可用的工具获取实际数据进行分析，而不是基于假设。如果某些数据无法获取，请尝试使用不同的时间周期或其他工具组合，基于可用信息提供尽可能全面的分析。"""
+            # 3. 填充基本面分析请求模板
+            agent_input = FUNDAMENTAL_PROMPT_TEMPLATE.format(
+                company_name=company_name,
+                stock_code=stock_code,
+                current_time_info=current_time_info,
+                current_date=current_date
+            )
 
             logger.info(f"Agent input: {agent_input}")
 
-            # 5. 调用ReAct Agent - 使用正确的messages格式
+            # 4. 运行工具调用循环 - 每轮一次LLM请求，推理与工具调用在同一次补全中返回
             logger.info(
-                f"{WAIT_ICON} FundamentalAgent: Calling ReAct agent...")
-            start_time = time.time()
+                f"{WAIT_ICON} FundamentalAgent: Running tool-calling loop...")
+            start_time = time.perf_counter()
+
+            try:
+                messages = await asyncio.wait_for(
+                    _run_tool_calling_loop(
+                        llm, mcp_tools, [HumanMessage(content=agent_input)], agent_name),
+                    timeout=AGENT_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                execution_time = time.perf_counter() - start_time
+                logger.error(
+                    f"{ERROR_ICON} FundamentalAgent: Tool-calling loop timed out after {execution_time:.2f} seconds")
+                current_data["fundamental_analysis_error"] = f"timeout after {AGENT_TIMEOUT_SECONDS:.0f}s"
+                current_data["fundamental_analysis"] = f"基本面分析超时（超过{AGENT_TIMEOUT_SECONDS:.0f}秒）"
+                current_metadata["fundamental_agent_error"] = "timeout"
 
-            # LangGraph ReAct Agent需要messages格式的输入
-            input_data = {
-                "messages": [HumanMessage(content=agent_input)]
-            }
+                # 记录 Agent执行失败
+                log_in_background(execution_logger.log_agent_complete,
+                    agent_name, dict(current_data), time.perf_counter() - agent_start, False, "timeout")
 
-            # 调用 Agent执行分析
-            response = await agent.ainvoke(input_data)
+                return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
 
-            end_time = time.time()
-            execution_time = end_time - start_time
+            execution_time = time.perf_counter() - start_time
 
             logger.info(
-                f"ReAct agent execution completed in {execution_time:.2f} seconds")
+                f"Tool-calling loop completed in {execution_time:.2f} seconds")
 
-            # 6. 提取分析结果
+            # 5. 提取分析结果
             final_output = "No analysis generated."
 
-            if "messages" in response and isinstance(response["messages"], list):
-                messages = response["messages"]
-                # 查找最后一条AI消息，这通常包含最终的分析结果
-                ai_messages = [
-                    msg for msg in messages if isinstance(msg, AIMessage)]
-                if ai_messages:
-                    last_ai_message = ai_messages[-1]
-                    final_output = last_ai_message.content
-                    logger.info(
-                        f"Successfully extracted analysis from AI message.")
-                else:
-                    logger.warning("No AI messages found in response")
-                    # 如果没有AI消息，尝试获取所有消息的内容
-                    all_content = []
-                    for msg in messages:
-                        if hasattr(msg, 'content') and msg.content:
-                            all_content.append(str(msg.content))
-                    if all_content:
-                        final_output = "\n".join(all_content)
+            # 从后向前查找最后一条AI消息，这通常包含最终的分析结果
+            last_ai_message = next(
+                (msg for msg in reversed(messages) if isinstance(msg, AIMessage)), None)
+            if last_ai_message is not None:
+                final_output = last_ai_message.content
+                logger.info(
+                    f"Successfully extracted analysis from AI message.")
             else:
-                logger.error(f"Unexpected response format: {type(response)}")
-                logger.error(
-                    f"Response keys: {response.keys() if isinstance(response, dict) else 'Not a dict'}")
+                logger.warning("No AI messages found in response")
+                # 如果没有AI消息，尝试获取所有消息的内容
+                all_content = []
+                for msg in messages:
+                    if hasattr(msg, 'content') and msg.content:
+                        all_content.append(str(msg.content))
+                if all_content:
+                    final_output = "\n".join(all_content)
 
             logger.info(
                 f"Final extracted analysis length: {len(final_output)} characters")
-            print(f"FUNDAMENTALAGENT: {final_output}")
-            # 7. 记录LLM交互，用于后续分析和优化
+            # 完整分析文本只写入DEBUG级别日志（日志文件），不再同步输出到控制台
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("FUNDAMENTALAGENT output: %s", final_output)
+            # 6. 记录LLM交互，用于后续分析和优化
             model_config = {
-                "model": model_name,
-                "temperature": 0.3,
-                "max_tokens": 6000,
-                "api_base": base_url
+                "model": llm.model_name,
+                "temperature": LLM_TEMPERATURE,
+                "max_tokens": LLM_MAX_TOKENS,
+                "api_base": llm.openai_api_base
             }
             
-            execution_logger.log_llm_interaction(
+            log_in_background(execution_logger.log_llm_interaction,
                 agent_name=agent_name,
                 interaction_type="react_agent",
                 input_messages=[{"role": "user", "content": agent_input}],
@@ -224,19 +440,23 @@ async def fundamental_agent(state: AgentState) -> AgentState:
             logger.info(
                 f"{SUCCESS_ICON} FundamentalAgent: Successfully completed fundamental analysis.")
             
-            # 8. 更新状态，保存分析结果和元数据
+            # 7. 更新状态，保存分析结果和元数据
             current_data["fundamental_analysis"] = final_output
             current_metadata["fundamental_agent_executed"] = True
-            current_metadata["fundamental_agent_timestamp"] = str(time.time())
+            current_metadata["fundamental_agent_timestamp"] = datetime.now().isoformat()
             current_metadata["fundamental_agent_execution_time"] = f"{execution_time:.2f} seconds"
 
-            # 9. 添加消息记录，保持对话历史
+            # 只缓存成功生成的分析结果
+            if cache_key and final_output != "No analysis generated.":
+                await asyncio.to_thread(analysis_cache.set, cache_key, final_output)
+
+            # 8. 添加消息记录，保持对话历史
             new_message = {"role": "assistant", "content": "基本面分析已完成"}
             updated_messages = current_messages + [new_message]
 
             # 记录 Agent执行成功
-            total_execution_time = time.time() - agent_start_time
-            execution_logger.log_agent_complete(agent_name, {
+            total_execution_time = time.perf_counter() - agent_start
+            log_in_background(execution_logger.log_agent_complete, agent_name, {
                 "fundamental_analysis_length": len(final_output),
                 "analysis_preview": final_output[:500] if len(final_output) > 500 else final_output,
                 "llm_execution_time": execution_time,
@@ -258,8 +478,8 @@ async def fundamental_agent(state: AgentState) -> AgentState:
             current_metadata["fundamental_agent_error"] = str(e)
 
             # 记录 Agent执行失败
-            execution_logger.log_agent_complete(
-                agent_name, current_data, time.time() - agent_start_time, False, str(e))
+            log_in_background(execution_logger.log_agent_complete,
+                agent_name, dict(current_data), time.perf_counter() - agent_start, False, str(e))
 
             return {
                 "data": current_data,
@@ -274,8 +494,8 @@ async def fundamental_agent(state: AgentState) -> AgentState:
         current_metadata["fundamental_agent_error"] = str(e)
 
         # 记录 Agent执行失败
-        execution_logger.log_agent_complete(
-            agent_name, current_data, time.time() - agent_start_time, False, str(e))
+        log_in_background(execution_logger.log_agent_complete,
+            agent_name, dict(current_data), time.perf_counter() - agent_start, False, str(e))
 
         return {
             "data": current_data,
@@ -288,7 +508,6 @@ async def fundamental_agent(state: AgentState) -> AgentState:
 async def test_fundamental_agent():
     """基本面分析 Agent的测试函数"""
     from src.utils.state_definition import AgentState
-    from datetime import datetime
 
     # 准备测试数据，包含当前时间信息
     current_datetime = datetime.now()
@@ -325,5 +544,7 @@ async def test_fundamental_agent():
     return result
 
 if __name__ == "__main__":
-    import asyncio
+    # 环境变量由程序入口（src/main.py）统一加载，单独运行本模块测试时在这里加载.env
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
     asyncio.run(test_fundamental_agent())
@@ -4,26 +4,176 @@ Summary Agent: Consolidates analyses from other agents into a final report.
 """
 import os
 import time
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI  # 恢复OpenAI导入
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import asyncio
+import hashlib
+import shutil
+import threading
+from typing import Dict, Any, Tuple
 import re
+import string
 
 from src.utils.state_definition import AgentState
 from src.utils.logging_config import setup_logger, ERROR_ICON, SUCCESS_ICON, WAIT_ICON
-from src.utils.execution_logger import get_execution_logger
-from dotenv import load_dotenv
-
-# 从.env文件加载环境变量
-load_dotenv(override=True)
+from src.utils.execution_logger import get_execution_logger, log_in_background
+from src.utils.llm_config import llm_cfg, get_chat_llm
+from src.utils.analysis_cache import AnalysisCache
 
 logger = setup_logger(__name__)
 
+# torch/transformers 只在首次加载本地FinR1模型时导入，默认的API路径不加载这些大型依赖
+_finr1_imports_done = False
+
+
+def _ensure_finr1_imports():
+    """首次调用时导入torch和transformers并绑定到模块全局，之后的调用直接返回"""
+    global _finr1_imports_done, torch, AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, StoppingCriteriaList
+    if _finr1_imports_done:
+        return
+    # torch.compile生成的内核缓存到磁盘，进程重启后直接复用（必须在导入torch之前设置）
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.expanduser("~/.cache/finr1_inductor"))
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, StoppingCriteriaList
+    _finr1_imports_done = True
+
+# 汇总报告生成温度（API与本地FinR1一致），同时作为报告缓存键的一部分
+SUMMARY_TEMPERATURE = 0.5
+
+# 汇总报告最大输出长度（API与本地FinR1一致）
+SUMMARY_MAX_TOKENS = 5000
+
+# 汇总报告缓存：相同分析结果、查询、日期、模型和温度生成的报告直接复用（重跑、重试时跳过LLM调用）
+# 缓存的是清理和截断后的最终报告，其中的时间信息以占位符保存，命中时替换为本次运行的时间
+summary_cache = AnalysisCache("summary_agent")
+# 汇总提示词或缓存内容格式修改后递增，使旧的报告缓存失效
+SUMMARY_CACHE_VERSION = "v2"
+_CACHED_TIME_PLACEHOLDER = "{{current_time_info}}"
+
+# 汇总提示词模板：常量部分在导入时构建一次，调用时只替换占位符
+_SYSTEM_PROMPT_TEMPLATE = string.Template("""
+        你是一个专业金融分析师，负责创建全面、深入的股票分析报告。
+        
+        **重要时间信息：当前实际时间是 $current_time_info**
+        **分析基准日期：$current_date**
+        
+        这是真实的当前时间，不是你的训练数据截止时间。请在生成报告时：
+        - 基于实际当前时间来判断数据的时效性
+        - 正确标注"最新"、"近期"、"历史"等时间概念
+        - 在报告中明确标注分析的时间基准点为：$current_date
+        - 所有时间相关的描述都要基于这个实际日期
+        
+        你的任务是综合四种不同的分析结果：
+        1. 基本面分析 - 关注财务报表、商业模式和公司基本面
+        2. 技术分析 - 关注价格趋势、交易量模式和技术指标
+        3. 估值分析 - 关注估值指标和相对价值
+        4. 新闻分析 - 关注市场情绪、重要事件和媒体报道对股价的影响
+
+        请创建一份结构清晰、内容连贯的报告，整合所有四种分析的见解。
+        即使某些分析数据不完整或缺失，也请基于可用信息提供最佳的综合分析。
+
+        **严格遵循以下报告格式和结构：**
+        
+        # [公司名称]([股票代码]) 综合分析报告
+        
+        ## 执行摘要
+        [提供简明扼要的总体分析和投资建议，包括风险等级和预期回报]
+        
+        ## 公司概况
+        [简要介绍公司的业务、行业地位、主要产品或服务]
+        
+        ## 基本面分析
+        [详细分析公司财务状况、盈利能力、成长性、资产负债情况等]
+        
+        ## 技术分析
+        [详细分析价格趋势、技术指标、支撑位和阻力位、交易量等]
+        
+        ## 估值分析
+        [详细分析估值指标、与行业平均水平比较、历史估值水平、股息收益率等]
+        
+        ## 新闻分析
+        [详细分析市场情绪、重要新闻事件、媒体报道、分析师评级变化等对股价的影响]
+        
+        ## 综合评估
+        [分析不同分析方法之间的一致点和分歧点，提供更全面的投资视角]
+        
+        ## 风险因素
+        [详细分析潜在的风险因素，包括市场风险、行业风险、公司特定风险等]
+        
+        ## 投资建议
+        [提供明确的投资建议，包括目标价格、投资时间范围、适合的投资者类型等]
+        
+        ## 附录：数据来源与限制
+        [说明数据来源，以及分析过程中遇到的任何数据限制或缺失]
+
+        输出必须是有效的Markdown格式，使用适当的标题、项目符号和格式。
+        不要包含任何代码块标记，如```markdown或```，直接输出纯Markdown内容。
+        
+        使用专业的金融语言，但保持可读性。报告应该全面且深入，包含足够的细节和数据支持，
+        同时聚焦于最重要的见解，帮助投资者做出决策。
+        
+        **重要提醒：**
+        - 请在报告末尾明确标注分析基准时间：$current_time_info
+        - 基于这个实际时间来判断所有数据的时效性
+        - 避免使用模糊的时间概念，要基于实际当前时间进行判断
+        - 严格按照上述格式和结构生成报告，确保每个章节都有实质性内容
+        
+        如果某些分析数据不完整或有错误，请在报告中明确说明，并尽可能基于可用信息提供有价值的分析。
+        """)
+
+_USER_PROMPT_TEMPLATE = string.Template("""
+        Please create a comprehensive analysis report for $company_name ($stock_code) based on the following analyses.
+        
+        Original user query: $user_query
+        
+        FUNDAMENTAL ANALYSIS:
+        $fundamental_analysis
+        
+        TECHNICAL ANALYSIS:
+        $technical_analysis
+        
+        VALUE ANALYSIS:
+        $value_analysis
+        
+        NEWS ANALYSIS:
+        $news_analysis
+        
+        $errors_block
+        
+        IMPORTANT: Your output MUST be in valid Markdown format with proper headings, bullet points, 
+        and formatting. Include a clear recommendation section at the end.
+        
+        DO NOT include any code block markers like ```markdown or ``` in your output.
+        Just write pure Markdown content directly.
+        """)
+
+# FinR1本地模型路径
+FINR1_MODEL_PATH = "/root/code/Finance/FinR1"
+
+# 已加载的FinR1模型缓存：(model_path, backend, quantization, compile) -> (model, tokenizer)，避免每次生成报告都重新加载权重
+_FINR1_CACHE: Dict[Tuple[str, str, str, bool], Tuple[Any, Any]] = {}
+_FINR1_LOCK = threading.Lock()
+
+# FinR1微批处理：并发的汇总请求在短时间窗口内合并为一次generate调用
+# FINR1_BATCH_SIZE=1 时关闭微批处理，每个请求单独生成
+FINR1_BATCH_SIZE = max(1, int(os.getenv("FINR1_BATCH_SIZE", "8")))
+FINR1_BATCH_WAIT_SECONDS = 0.02
+
+# 批处理队列和后台任务与事件循环绑定，在第一次请求时创建
+_batch_queue = None
+_batch_worker_task = None
+_batch_loop = None
+
+# 报告中标注分析基准时间时可能使用的前缀，按截断优先级排列
+_BASELINE_PREFIXES = ("分析基准时间", "基准时间", "时间基准", "分析时间", "报告时间",
+                      "生成时间", "更新时间", "数据时间", "分析基准")
+_BASELINE_PRIORITY = {prefix: i for i, prefix in enumerate(_BASELINE_PREFIXES)}
+# 所有前缀合并为一个预编译的正则；"分析基准时间"排在"分析基准"之前，保证优先匹配较长的前缀
+_BASELINE_PREFIX_RE = re.compile(
+    r"(?P<prefix>" + "|".join(_BASELINE_PREFIXES) + r")[：:]\s*")
+
 
 def truncate_report_at_baseline_time(report_content: str, current_time_info: str) -> str:
     """
-    使用正则表达式截断报告，在"分析基准时间"那一行之后停止
+    截断报告，在"分析基准时间"那一行之后停止
     
     Args:
         report_content: 完整的报告内容
@@ -32,57 +182,43 @@ def truncate_report_at_baseline_time(report_content: str, current_time_info: str
     Returns:
         截断后的报告内容
     """
-    # 构建多种可能的"分析基准时间"模式
-    baseline_patterns = [
-        rf'分析基准时间[：:]\s*{re.escape(current_time_info)}',
-        rf'分析基准时间[：:]\s*{re.escape(current_time_info)}\s*$',
-        rf'基准时间[：:]\s*{re.escape(current_time_info)}',
-        rf'时间基准[：:]\s*{re.escape(current_time_info)}',
-        rf'分析时间[：:]\s*{re.escape(current_time_info)}',
-        rf'报告时间[：:]\s*{re.escape(current_time_info)}',
-        rf'生成时间[：:]\s*{re.escape(current_time_info)}',
-        rf'更新时间[：:]\s*{re.escape(current_time_info)}',
-        rf'数据时间[：:]\s*{re.escape(current_time_info)}',
-        rf'分析基准[：:]\s*{re.escape(current_time_info)}'
-    ]
-    
-    # 尝试匹配各种模式
-    for pattern in baseline_patterns:
-        match = re.search(pattern, report_content, re.MULTILINE | re.IGNORECASE)
-        if match:
-            # 找到匹配位置，截断到该行的末尾
-            end_pos = match.end()
-            
-            # 查找该行的结束位置（换行符）
-            line_end = report_content.find('\n', end_pos)
-            if line_end == -1:
-                # 如果没有换行符，说明是最后一行，直接截断
-                truncated_content = report_content[:end_pos].strip()
-            else:
-                # 截断到该行结束
-                truncated_content = report_content[:line_end].strip()
-            
-            logger.info(f"截断报告在'分析基准时间'行之后，截断位置: {end_pos}")
-            return truncated_content
-    
-    # 如果没有找到匹配的模式，尝试查找包含时间信息的行
-    time_patterns = [
-        rf'.*{re.escape(current_time_info)}.*',
-        rf'.*{re.escape(current_time_info.split()[0])}.*',  # 只匹配日期部分
-        rf'.*{re.escape(current_time_info.split()[1])}.*'   # 只匹配时间部分
-    ]
+    # 一次扫描找出所有"前缀：当前时间"的位置，按前缀优先级选出截断点
+    best_priority, end_pos = None, None
+    for match in _BASELINE_PREFIX_RE.finditer(report_content):
+        if not report_content.startswith(current_time_info, match.end()):
+            continue
+        priority = _BASELINE_PRIORITY[match.group("prefix")]
+        if best_priority is None or priority < best_priority:
+            best_priority, end_pos = priority, match.end() + len(current_time_info)
+            if priority == 0:
+                break
+
+    if end_pos is not None:
+        # 查找该行的结束位置（换行符）
+        line_end = report_content.find('\n', end_pos)
+        if line_end == -1:
+            # 如果没有换行符，说明是最后一行，直接截断
+            truncated_content = report_content[:end_pos].strip()
+        else:
+            # 截断到该行结束
+            truncated_content = report_content[:line_end].strip()
+
+        logger.info(f"截断报告在'分析基准时间'行之后，截断位置: {end_pos}")
+        return truncated_content
     
-    for pattern in time_patterns:
-        match = re.search(pattern, report_content, re.MULTILINE | re.IGNORECASE)
-        if match:
-            end_pos = match.end()
-            line_end = report_content.find('\n', end_pos)
+    # 如果没有找到匹配的模式，查找第一处包含时间信息的行（依次尝试完整时间、日期部分、时间部分）
+    # 这里是纯字面量查找，直接使用str.find，无需正则
+    needle_variants = [current_time_info] + current_time_info.split()[:2]
+    for needle in needle_variants:
+        match_pos = report_content.find(needle)
+        if match_pos != -1:
+            line_end = report_content.find('\n', match_pos)
             if line_end == -1:
-                truncated_content = report_content[:end_pos].strip()
+                truncated_content = report_content.strip()
             else:
                 truncated_content = report_content[:line_end].strip()
-            
-            logger.info(f"截断报告在时间信息行之后，截断位置: {end_pos}")
+
+            logger.info(f"截断报告在时间信息行之后，截断位置: {match_pos}")
             return truncated_content
     
     # 如果都没有找到，返回原始内容
@@ -90,69 +226,237 @@ def truncate_report_at_baseline_time(report_content: str, current_time_info: str
     return report_content
 
 
-def load_finr1_model(model_path="/root/code/Finance/FinR1"):
-    """加载FinR1模型"""
-    logger.info(f"{WAIT_ICON} Loading FinR1 model from {model_path}...")
-    
+def get_finr1_backend():
+    """
+    获取FinR1推理后端，默认使用transformers
+
+    可通过环境变量 FINR1_BACKEND 设置：
+    - "hf": transformers原生推理（默认）
+    - "onnx": ONNX Runtime推理（需要安装 optimum[onnxruntime-gpu]），首次加载时导出ONNX模型并保存到 <模型路径>-onnx
+    """
+    return os.getenv("FINR1_BACKEND", "hf").lower()
+
+
+def get_finr1_quantization():
+    """
+    获取FinR1权重量化方式（仅对transformers后端生效），默认使用4bit NF4量化
+
+    解码阶段受显存带宽限制，量化后每步读取的权重字节数减少，生成速度更快、显存占用更低。
+    可通过环境变量 FINR1_QUANTIZATION 设置："nf4"（默认）、"int8" 或 "none"（fp16）。
+    """
+    return os.getenv("FINR1_QUANTIZATION", "nf4").lower()
+
+
+def _build_quantization_config(quantization):
+    """根据量化方式构建BitsAndBytesConfig，未安装bitsandbytes时退回fp16"""
+    if quantization not in ("nf4", "int8"):
+        return None
+
     try:
-        # 加载tokenizer
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
-        
-        # 加载模型
-        model = AutoModelForCausalLM.from_pretrained(
-            model_path,
-            torch_dtype=torch.float16,
-            device_map="auto",
-            trust_remote_code=True
-        )
-        
-        model.eval()
-        logger.info(f"{SUCCESS_ICON} FinR1 model loaded successfully")
-        return model, tokenizer
-    
-    except Exception as e:
-        logger.error(f"{ERROR_ICON} Failed to load FinR1 model: {e}")
-        raise e
+        import bitsandbytes  # noqa: F401  仅检查是否已安装
+    except ImportError:
+        logger.warning(
+            f"bitsandbytes is not installed, loading FinR1 in fp16 instead of {quantization}")
+        return None
+
+    if quantization == "int8":
+        return BitsAndBytesConfig(load_in_8bit=True)
+    return BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_compute_dtype=torch.float16,
+        bnb_4bit_quant_type="nf4"
+    )
+
+
+def _load_hf_model(model_path, quantization):
+    """使用transformers加载FinR1模型"""
+    quantization_config = _build_quantization_config(quantization)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        torch_dtype=torch.float16,
+        quantization_config=quantization_config,
+        device_map="auto",
+        trust_remote_code=True
+    )
+    model.eval()
+    return model
+
+
+def finr1_compile_enabled():
+    """
+    是否使用torch.compile编译FinR1（仅对transformers后端生效），通过环境变量 FINR1_TORCH_COMPILE=1 开启
 
+    首次编译一个大模型需要数分钟，因此默认关闭；开启后编译产物缓存在 TORCHINDUCTOR_CACHE_DIR，
+    之后的进程可直接加载。
+    """
+    return os.getenv("FINR1_TORCH_COMPILE", "0") == "1"
+
+
+def _compile_hf_model(model, tokenizer):
+    """
+    编译模型的forward并改用静态KV缓存，然后用一个短提示预热，使编译在加载阶段完成
+
+    静态KV缓存让解码阶段每一步的张量形状固定，编译后的内核（及CUDA Graph）可以在各次生成间复用。
+    """
+    logger.info(f"{WAIT_ICON} Compiling FinR1 model with torch.compile...")
+    model.generation_config.cache_implementation = "static"
+    model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=False)
+
+    warmup_inputs = tokenizer("预热", return_tensors="pt").to(model.device)
+    with torch.no_grad():
+        model.generate(**warmup_inputs, max_new_tokens=8,
+                       pad_token_id=tokenizer.eos_token_id)
+    logger.info(f"{SUCCESS_ICON} FinR1 model compiled and warmed up")
+
+
+def _onnx_export_dir(model_path):
+    """导出的ONNX模型保存在模型目录旁的 <模型路径>-onnx 目录"""
+    return os.path.normpath(model_path) + "-onnx"
+
+
+def _load_onnx_model(model_path):
+    """
+    使用ONNX Runtime加载FinR1模型，返回的模型与transformers模型一样支持generate()
+
+    已导出过的模型直接从 <模型路径>-onnx 加载；否则从原模型导出（耗时数分钟）并保存，之后的进程不再重复导出。
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise ImportError(
+            "FINR1_BACKEND=onnx requires optimum with onnxruntime: pip install optimum[onnxruntime-gpu]") from e
+
+    provider = "CUDAExecutionProvider" if torch.cuda.is_available() else "CPUExecutionProvider"
+    load_kwargs = dict(provider=provider, use_io_binding=provider == "CUDAExecutionProvider",
+                       trust_remote_code=True)
+
+    export_dir = _onnx_export_dir(model_path)
+    if os.path.isdir(export_dir):
+        logger.info(f"{WAIT_ICON} Loading exported ONNX model from {export_dir}")
+        return ORTModelForCausalLM.from_pretrained(export_dir, export=False, **load_kwargs)
+
+    logger.info(f"{WAIT_ICON} Exporting FinR1 model to ONNX (first load only)...")
+    model = ORTModelForCausalLM.from_pretrained(model_path, export=True, **load_kwargs)
+
+    # 先保存到临时目录再重命名，导出中断时不会留下不完整的ONNX模型目录
+    tmp_dir = export_dir + ".tmp"
+    try:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        model.save_pretrained(tmp_dir)
+        os.replace(tmp_dir, export_dir)
+        logger.info(f"{SUCCESS_ICON} Exported ONNX model saved to {export_dir}")
+    except OSError as e:
+        # 保存失败不影响本次推理，只是下次启动时需要重新导出
+        logger.warning(f"Failed to save exported ONNX model to {export_dir}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return model
+
+
+def load_finr1_model(model_path=FINR1_MODEL_PATH):
+    """加载FinR1模型，同一路径和后端的模型在进程内只加载一次，之后直接返回缓存的 (model, tokenizer)"""
+    backend = get_finr1_backend()
+    quantization = get_finr1_quantization()
+    compile_model = backend != "onnx" and finr1_compile_enabled()
+    cache_key = (model_path, backend, quantization, compile_model)
+    cached = _FINR1_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with _FINR1_LOCK:
+        # 等待锁期间其他线程可能已完成加载
+        cached = _FINR1_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        logger.info(f"{WAIT_ICON} Loading FinR1 model from {model_path} (backend: {backend})...")
+
+        try:
+            _ensure_finr1_imports()
+
+            # 加载tokenizer
+            tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+            # 加载模型
+            if backend == "onnx":
+                model = _load_onnx_model(model_path)
+            else:
+                model = _load_hf_model(model_path, quantization)
+                if compile_model:
+                    _compile_hf_model(model, tokenizer)
 
-def generate_report_with_finr1(model, tokenizer, prompt, max_new_tokens=5000):
-    """使用FinR1模型生成报告"""
+            logger.info(f"{SUCCESS_ICON} FinR1 model loaded successfully")
+            _FINR1_CACHE[cache_key] = (model, tokenizer)
+            return model, tokenizer
+
+        except Exception as e:
+            logger.error(f"{ERROR_ICON} Failed to load FinR1 model: {e}")
+            raise e
+
+
+def _make_baseline_stopper(tokenizer, current_time_info):
+    """
+    创建一个同时作为流式输出器和停止条件的对象：
+    生成过程中逐行检查文本，一旦完整输出了"分析基准时间：{current_time_info}"这一行就停止生成
+
+    该行之后的内容最终都会被 truncate_report_at_baseline_time 截掉，提前停止可以省下剩余的解码步数。
+    只检查优先级最高的前缀，保证提前停止后的截断结果与完整生成后截断完全一致。
+    """
+    from transformers import StoppingCriteria, TextStreamer
+
+    stop_re = re.compile(
+        _BASELINE_PREFIXES[0] + r"[：:]\s*" + re.escape(current_time_info) + r"[^\n]*\n")
+
+    class _BaselineStopper(TextStreamer, StoppingCriteria):
+        def __init__(self):
+            TextStreamer.__init__(self, tokenizer, skip_prompt=True, skip_special_tokens=True)
+            self.text = ""
+            self.found = False
+
+        def on_finalized_text(self, text, stream_end=False):
+            # TextStreamer按行输出已确定的文本，只需在出现换行时检查
+            self.text += text
+            if not self.found and "\n" in text:
+                self.found = stop_re.search(self.text) is not None
+
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), self.found, dtype=torch.bool, device=input_ids.device)
+
+    return _BaselineStopper()
+
+
+def generate_report_with_finr1(model, tokenizer, prompt, max_new_tokens=SUMMARY_MAX_TOKENS, current_time_info=None):
+    """
+    使用FinR1模型生成报告
+
+    传入current_time_info时，在输出分析基准时间行后提前停止生成
+    """
     
     try:
         # 编码输入
         inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=4096)
         inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        input_len = inputs["input_ids"].shape[-1]
         
+        # 报告写到分析基准时间行即可结束
+        stop_kwargs = {}
+        if current_time_info:
+            stopper = _make_baseline_stopper(tokenizer, current_time_info)
+            stop_kwargs = {"streamer": stopper, "stopping_criteria": StoppingCriteriaList([stopper])}
+
         # 生成预测
         with torch.no_grad():
             outputs = model.generate(
                 **inputs,
                 max_new_tokens=max_new_tokens,
                 do_sample=True,
-                temperature=0.5,
+                temperature=SUMMARY_TEMPERATURE,
                 pad_token_id=tokenizer.eos_token_id,
-                eos_token_id=tokenizer.eos_token_id
+                eos_token_id=tokenizer.eos_token_id,
+                **stop_kwargs
             )
         
-        # 解码输出
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # 提取生成的报告部分（移除输入提示）
-        # 方法1：尝试通过字符串匹配移除输入提示
-        if prompt in generated_text:
-            report = generated_text[len(prompt):].strip()
-        else:
-            # 方法2：如果字符串匹配失败，尝试通过token长度来提取
-            input_length = len(tokenizer.encode(prompt, return_tensors="pt")[0])
-            output_length = len(outputs[0])
-            
-            if output_length > input_length:
-                # 只保留新生成的部分
-                new_tokens = outputs[0][input_length:]
-                report = tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
-            else:
-                # 如果无法确定，返回完整文本但尝试清理
-                report = generated_text.strip()
+        # 只解码新生成的token，输出序列的前input_len个token即为输入提示
+        report = tokenizer.decode(outputs[0, input_len:], skip_special_tokens=True).strip()
         
         return report
     
@@ -161,6 +465,212 @@ def generate_report_with_finr1(model, tokenizer, prompt, max_new_tokens=5000):
         raise e
 
 
+def generate_reports_with_finr1_batch(model, tokenizer, prompts, max_new_tokens=SUMMARY_MAX_TOKENS, current_time_info=None):
+    """
+    使用FinR1模型在一次generate调用中为多个提示词生成报告，返回与prompts顺序一致的报告列表
+
+    只有单个提示词时使用current_time_info提前停止生成；批量生成时各序列结束位置不同，始终完整生成
+    """
+    if len(prompts) == 1:
+        return [generate_report_with_finr1(model, tokenizer, prompts[0], max_new_tokens, current_time_info)]
+
+    try:
+        # 解码器模型批量生成需要左侧填充，使所有序列的新token从同一位置开始
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=4096)
+        inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        input_len = inputs["input_ids"].shape[-1]
+
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=True,
+                temperature=SUMMARY_TEMPERATURE,
+                num_return_sequences=1,
+                use_cache=True,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id
+            )
+
+        # 填充后所有输入长度相同，只解码每个序列input_len之后新生成的token
+        return [report.strip() for report in
+                tokenizer.batch_decode(outputs[:, input_len:], skip_special_tokens=True)]
+
+    except Exception as e:
+        logger.error(f"{ERROR_ICON} Error generating batched reports with FinR1: {e}")
+        raise e
+
+
+async def _finr1_batch_worker(queue):
+    """后台任务：从队列中收集等待中的提示词，合并为一批交给FinR1生成，再把结果分发给各请求"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+
+        # 在等待窗口内继续收集，最多FINR1_BATCH_SIZE个请求
+        deadline = loop.time() + FINR1_BATCH_WAIT_SECONDS
+        while len(batch) < FINR1_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # 跳过已被取消的请求
+        batch = [item for item in batch if not item[-1].done()]
+        if not batch:
+            continue
+
+        if len(batch) > 1:
+            logger.info(f"{WAIT_ICON} SummaryAgent: Generating {len(batch)} reports in one FinR1 batch...")
+
+        try:
+            model, tokenizer = await asyncio.to_thread(load_finr1_model)
+            reports = await asyncio.to_thread(
+                generate_reports_with_finr1_batch, model, tokenizer, [prompt for prompt, _, _ in batch],
+                current_time_info=batch[0][1] if len(batch) == 1 else None)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        for (_, _, future), report in zip(batch, reports):
+            if not future.done():
+                future.set_result(report)
+
+
+async def generate_report_with_finr1_batched(prompt, current_time_info=None):
+    """
+    通过微批处理队列使用FinR1生成报告
+
+    FINR1_BATCH_SIZE为1时直接在线程中单独生成；否则提交到队列，由后台任务与其他并发请求合并生成。
+    """
+    global _batch_queue, _batch_worker_task, _batch_loop
+
+    if FINR1_BATCH_SIZE == 1:
+        model, tokenizer = await asyncio.to_thread(load_finr1_model)
+        return await asyncio.to_thread(
+            generate_report_with_finr1, model, tokenizer, prompt, current_time_info=current_time_info)
+
+    loop = asyncio.get_running_loop()
+    if _batch_loop is not loop or _batch_worker_task is None or _batch_worker_task.done():
+        _batch_queue = asyncio.Queue()
+        _batch_worker_task = loop.create_task(_finr1_batch_worker(_batch_queue))
+        _batch_loop = loop
+
+    future = loop.create_future()
+    await _batch_queue.put((prompt, current_time_info, future))
+    return await future
+
+
+# 需要汇总的前序分析：(结果键, 错误键, 错误信息标签)
+_ANALYSES = (
+    ("fundamental_analysis", "fundamental_analysis_error", "Fundamental"),
+    ("technical_analysis", "technical_analysis_error", "Technical"),
+    ("value_analysis", "value_analysis_error", "Value"),
+    ("news_analysis", "news_analysis_error", "News"),
+)
+
+
+def _collect_analyses(current_data):
+    """
+    一次遍历收集前序 Agent的分析结果和错误信息
+
+    Returns:
+        (analyses, errors)：analyses 为 {结果键: 分析文本}，缺失的分析为"Not available"；
+        errors 为各分析的错误描述列表
+    """
+    analyses = {}
+    errors = []
+    for key, error_key, label in _ANALYSES:
+        analyses[key] = current_data.get(key, "Not available")
+        if error_key in current_data:
+            errors.append(f"{label} Analysis Error: {current_data[error_key]}")
+    return analyses, errors
+
+
+# 报告文件名清理：空格替换为下划线，公司名称中的"."直接删除
+_QUERY_NAME_TRANS = str.maketrans({" ": "_"})
+_COMPANY_NAME_TRANS = str.maketrans({" ": "_", ".": None})
+_EXCHANGE_PREFIX_RE = re.compile(r"sh\.|sz\.")
+
+
+def _build_report_name(stock_code, company_name, user_query):
+    """
+    根据股票代码、公司名称和用户查询生成报告文件名中的名称部分
+
+    股票代码缺失时使用用户查询；公司名称缺失时用用户查询代替公司名称，并拼接去掉交易所前缀的股票代码。
+    """
+    query_name = user_query.translate(_QUERY_NAME_TRANS).replace("分析", "").strip()
+
+    if stock_code == "Unknown Stock" or stock_code == "Extracted from analysis":
+        # 从用户查询中提取更有意义的名称
+        return query_name or "financial_analysis"
+
+    # 正常情况下使用公司名称和股票代码
+    safe_company_name = company_name.translate(_COMPANY_NAME_TRANS)
+    if safe_company_name == "Unknown_Company" or safe_company_name == "Extracted_from_analysis":
+        safe_company_name = query_name or "company"
+
+    # 清理股票代码（移除可能的前缀）
+    clean_stock_code = _EXCHANGE_PREFIX_RE.sub("", stock_code)
+    return f"{safe_company_name}_{clean_stock_code}"
+
+
+# 执行日志中报告预览的最大长度（报告全文保存在报告文件中）
+REPORT_PREVIEW_CHARS = 500
+
+
+def _message_ref(role, content):
+    """LLM交互日志中用摘要代替完整的提示词内容，避免重复序列化数KB的文本"""
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+    return {"role": role, "content": f"<sha1:{digest}, {len(content)} chars>"}
+
+
+def _finalize_report(report_content: str, current_time_info: str) -> str:
+    """移除markdown代码块标记，并截断"分析基准时间"那一行之后的内容"""
+    report_content = report_content.replace("```markdown", "").replace("```", "").strip()
+    return truncate_report_at_baseline_time(report_content, current_time_info)
+
+
+def _load_cached_report(cache_key: str, current_time_info: str):
+    """读取缓存的最终报告，并把其中的时间占位符替换为本次运行的时间；未命中时返回None"""
+    report = summary_cache.get(cache_key)
+    if report is None:
+        return None
+    return report.replace(_CACHED_TIME_PLACEHOLDER, current_time_info)
+
+
+def _store_cached_report(cache_key: str, report: str, current_time_info: str):
+    """缓存最终报告，报告中生成时的时间信息替换为占位符（缓存键不含时间，命中时时间会不同）"""
+    if current_time_info:
+        report = report.replace(current_time_info, _CACHED_TIME_PLACEHOLDER)
+    summary_cache.set(cache_key, report)
+
+
+# 报告保存目录（项目根目录下的reports），首次写入报告时创建
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), "reports")
+_REPORTS_DIR_READY = False
+
+
+def _write_report(report_path, content):
+    """将报告写入文件（同步函数，在线程中调用），报告目录在进程内只创建一次"""
+    global _REPORTS_DIR_READY
+    if not _REPORTS_DIR_READY:
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        _REPORTS_DIR_READY = True
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
 def get_model_choice():
     """获取模型选择，默认选择API"""
     # 可以通过环境变量控制模型选择
@@ -185,7 +695,7 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
     user_query = current_data.get("query", "")
 
     # 记录 Agent开始执行，包含可用的分析类型
-    execution_logger.log_agent_start(agent_name, {
+    log_in_background(execution_logger.log_agent_start, agent_name, {
         "user_query": user_query,
         "available_analyses": {
             "fundamental": "fundamental_analysis" in current_data,
@@ -199,33 +709,17 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
     # 记录 Agent开始时间，用于计算执行时长
     agent_start_time = time.time()
 
-    # 获取之前 Agent的分析结果
-    fundamental_analysis = current_data.get(
-        "fundamental_analysis", "Not available")
-    technical_analysis = current_data.get(
-        "technical_analysis", "Not available")
-    value_analysis = current_data.get("value_analysis", "Not available")
-    news_analysis = current_data.get("news_analysis", "Not available")
-
-    # 处理各个分析的错误信息
-    errors = []
-    if "fundamental_analysis_error" in current_data:
-        errors.append(
-            f"Fundamental Analysis Error: {current_data['fundamental_analysis_error']}")
-    if "technical_analysis_error" in current_data:
-        errors.append(
-            f"Technical Analysis Error: {current_data['technical_analysis_error']}")
-    if "value_analysis_error" in current_data:
-        errors.append(
-            f"Value Analysis Error: {current_data['value_analysis_error']}")
-    if "news_analysis_error" in current_data:
-        errors.append(
-            f"News Analysis Error: {current_data['news_analysis_error']}")
+    # 获取之前 Agent的分析结果及其错误信息
+    analyses, errors = _collect_analyses(current_data)
 
     # 基本股票标识信息
     stock_code = current_data.get("stock_code", "Unknown Stock")
     company_name = current_data.get("company_name", "Unknown Company")
 
+    # 报告文件名中的名称部分和时间戳，成功和错误报告共用
+    report_name = _build_report_name(stock_code, company_name, user_query)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+
     try:
         # 获取模型选择
         model_choice = get_model_choice()
@@ -236,119 +730,48 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
         current_date = current_data.get("current_date", "未知日期")
 
         # 准备汇总的系统提示词
-        system_prompt = f"""
-        你是一个专业金融分析师，负责创建全面、深入的股票分析报告。
-        
-        **重要时间信息：当前实际时间是 {current_time_info}**
-        **分析基准日期：{current_date}**
-        
-        这是真实的当前时间，不是你的训练数据截止时间。请在生成报告时：
-        - 基于实际当前时间来判断数据的时效性
-        - 正确标注"最新"、"近期"、"历史"等时间概念
-        - 在报告中明确标注分析的时间基准点为：{current_date}
-        - 所有时间相关的描述都要基于这个实际日期
-        
-        你的任务是综合四种不同的分析结果：
-        1. 基本面分析 - 关注财务报表、商业模式和公司基本面
-        2. 技术分析 - 关注价格趋势、交易量模式和技术指标
-        3. 估值分析 - 关注估值指标和相对价值
-        4. 新闻分析 - 关注市场情绪、重要事件和媒体报道对股价的影响
-
-        请创建一份结构清晰、内容连贯的报告，整合所有四种分析的见解。
-        即使某些分析数据不完整或缺失，也请基于可用信息提供最佳的综合分析。
-
-        **严格遵循以下报告格式和结构：**
-        
-        # [公司名称]([股票代码]) 综合分析报告
-        
-        ## 执行摘要
-        [提供简明扼要的总体分析和投资建议，包括风险等级和预期回报]
-        
-        ## 公司概况
-        [简要介绍公司的业务、行业地位、主要产品或服务]
-        
-        ## 基本面分析
-        [详细分析公司财务状况、盈利能力、成长性、资产负债情况等]
-        
-        ## 技术分析
-        [详细分析价格趋势、技术指标、支撑位和阻力位、交易量等]
-        
-        ## 估值分析
-        [详细分析估值指标、与行业平均水平比较、历史估值水平、股息收益率等]
-        
-        ## 新闻分析
-        [详细分析市场情绪、重要新闻事件、媒体报道、分析师评级变化等对股价的影响]
-        
-        ## 综合评估
-        [分析不同分析方法之间的一致点和分歧点，提供更全面的投资视角]
-        
-        ## 风险因素
-        [详细分析潜在的风险因素，包括市场风险、行业风险、公司特定风险等]
-        
-        ## 投资建议
-        [提供明确的投资建议，包括目标价格、投资时间范围、适合的投资者类型等]
-        
-        ## 附录：数据来源与限制
-        [说明数据来源，以及分析过程中遇到的任何数据限制或缺失]
-
-        输出必须是有效的Markdown格式，使用适当的标题、项目符号和格式。
-        不要包含任何代码块标记，如```markdown或```，直接输出纯Markdown内容。
-        
-        使用专业的金融语言，但保持可读性。报告应该全面且深入，包含足够的细节和数据支持，
-        同时聚焦于最重要的见解，帮助投资者做出决策。
-        
-        **重要提醒：**
-        - 请在报告末尾明确标注分析基准时间：{current_time_info}
-        - 基于这个实际时间来判断所有数据的时效性
-        - 避免使用模糊的时间概念，要基于实际当前时间进行判断
-        - 严格按照上述格式和结构生成报告，确保每个章节都有实质性内容
-        
-        如果某些分析数据不完整或有错误，请在报告中明确说明，并尽可能基于可用信息提供有价值的分析。
-        """
+        system_prompt = _SYSTEM_PROMPT_TEMPLATE.substitute(
+            current_time_info=current_time_info, current_date=current_date)
 
         # 准备汇总提示词
-        user_prompt = f"""
-        Please create a comprehensive analysis report for {company_name} ({stock_code}) based on the following analyses.
-        
-        Original user query: {user_query}
-        
-        FUNDAMENTAL ANALYSIS:
-        {fundamental_analysis}
-        
-        TECHNICAL ANALYSIS:
-        {technical_analysis}
-        
-        VALUE ANALYSIS:
-        {value_analysis}
-        
-        NEWS ANALYSIS:
-        {news_analysis}
-        
-        {"ANALYSIS ISSUES:" if errors else ""}
-        {". ".join(errors) if errors else ""}
-        
-        IMPORTANT: Your output MUST be in valid Markdown format with proper headings, bullet points, 
-        and formatting. Include a clear recommendation section at the end.
-        
-        DO NOT include any code block markers like ```markdown or ``` in your output.
-        Just write pure Markdown content directly.
-        """
+        # 错误信息块：与原提示词保持一致，无错误时为空行
+        errors_block = (f"ANALYSIS ISSUES:\n        {'. '.join(errors)}" if errors
+                        else "\n        ")
+        user_prompt = _USER_PROMPT_TEMPLATE.substitute(
+            analyses, company_name=company_name, stock_code=stock_code,
+            user_query=user_query, errors_block=errors_block)
+
+        # 相同分析结果、查询、日期、模型和温度已生成过报告时直接复用
+        # 缓存键只由稳定的输入构成；精确到秒的current_time_info每次运行都不同，不能参与缓存键
+        cache_model_name = "FinR1" if model_choice == "local" else (llm_cfg().model or "")
+        summary_cache_key = hashlib.blake2b("\x00".join([
+            *map(str, analyses.values()), *errors, user_query, stock_code, company_name, current_date,
+            cache_model_name, str(SUMMARY_TEMPERATURE), str(SUMMARY_MAX_TOKENS), SUMMARY_CACHE_VERSION,
+        ]).encode("utf-8"), digest_size=16).hexdigest()
+        cached_report = await asyncio.to_thread(_load_cached_report, summary_cache_key, current_time_info)
 
         # 根据模型选择决定使用哪种方式生成报告
-        if model_choice == "local":
+        if cached_report is not None:
+            logger.info(f"{SUCCESS_ICON} SummaryAgent: Using cached summary report.")
+            final_report = cached_report
+            llm_execution_time = 0.0
+
+        elif model_choice == "local":
             # 使用本地FinR1模型
             logger.info(f"{WAIT_ICON} SummaryAgent: Using local FinR1 model...")
             
             # 记录模型配置信息
             model_config = {
                 "model": "FinR1",
-                "temperature": 0.5,
-                "max_tokens": 5000,
-                "model_path": "/root/code/Finance/FinR1"
+                "backend": get_finr1_backend(),
+                "quantization": get_finr1_quantization(),
+                "temperature": SUMMARY_TEMPERATURE,
+                "max_tokens": SUMMARY_MAX_TOKENS,
+                "model_path": FINR1_MODEL_PATH
             }
 
-            # 加载FinR1模型
-            model, tokenizer = load_finr1_model()
+            # 预先加载FinR1模型（首次在线程中加载，避免阻塞事件循环；之后复用已加载的模型）
+            await asyncio.to_thread(load_finr1_model)
 
             # 组合完整的提示词
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
@@ -357,7 +780,8 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
             llm_start_time = time.time()
 
             # 使用FinR1模型生成最终报告
-            final_report = generate_report_with_finr1(model, tokenizer, full_prompt)
+            # 并发的汇总请求合并为一批生成，分词和生成在线程中进行，避免长时间阻塞事件循环
+            final_report = await generate_report_with_finr1_batched(full_prompt, current_time_info)
 
             # 记录LLM交互执行时间
             llm_execution_time = time.time() - llm_start_time
@@ -367,18 +791,17 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
             logger.info(f"{WAIT_ICON} SummaryAgent: Using OpenAI API...")
             
             # 创建OpenAI模型（使用直接API调用，而不是ReAct框架进行汇总）
-            api_key = os.getenv("OPENAI_COMPATIBLE_API_KEY")
-            base_url = os.getenv("OPENAI_COMPATIBLE_BASE_URL")
-            model_name = os.getenv("OPENAI_COMPATIBLE_MODEL")
+            cfg = llm_cfg()
+            base_url, model_name = cfg.base_url, cfg.model
 
             # 验证必要的环境变量是否存在
-            if not all([api_key, base_url, model_name]):
+            if not cfg.is_complete:
                 logger.error(
                     f"{ERROR_ICON} SummaryAgent: Missing OpenAI environment variables.")
                 current_data["summary_error"] = "Missing OpenAI environment variables."
 
                 # 记录 Agent执行失败
-                execution_logger.log_agent_complete(agent_name, current_data, time.time(
+                log_in_background(execution_logger.log_agent_complete, agent_name, dict(current_data), time.time(
                 ) - agent_start_time, False, "Missing OpenAI environment variables")
 
                 return {"data": current_data, "messages": messages}
@@ -386,8 +809,8 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
             # 记录模型配置信息
             model_config = {
                 "model": model_name,
-                "temperature": 0.5,
-                "max_tokens": 5000,
+                "temperature": SUMMARY_TEMPERATURE,
+                "max_tokens": SUMMARY_MAX_TOKENS,
                 "api_base": base_url
             }
 
@@ -397,15 +820,8 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
                 {"role": "user", "content": user_prompt}
             ]
 
-            # 使用ChatOpenAI模型
-            logger.info(f"{WAIT_ICON} SummaryAgent: Creating ChatOpenAI with model {model_name}")
-            llm = ChatOpenAI(
-                model=model_name,
-                api_key=api_key,
-                base_url=base_url,
-                temperature=0.5,  # 提高温度以增加创造性和更自然的表达
-                max_tokens=5000   # 增大输出长度以生成更详细的综合报告
-            )
+            # 获取（已缓存的）ChatOpenAI模型
+            llm = get_chat_llm(SUMMARY_TEMPERATURE, SUMMARY_MAX_TOKENS)
 
             # 记录LLM交互开始时间
             llm_start_time = time.time()
@@ -417,81 +833,57 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
             # 记录LLM交互执行时间
             llm_execution_time = time.time() - llm_start_time
 
-        # 记录LLM交互详情，用于后续分析和优化
-        execution_logger.log_llm_interaction(
-            agent_name=agent_name,
-            interaction_type="summary_generation",
-            input_messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-            output_content=final_report,
-            model_config=model_config,
-            execution_time=llm_execution_time
-        )
+        if cached_report is None:
+            # 移除markdown代码块标记并截断"分析基准时间"那一行之后的内容（缓存的报告已处理过）
+            final_report = _finalize_report(final_report, current_time_info)
 
-        # 移除任何可能出现的markdown代码块标记
-        final_report = final_report.replace(
-            "```markdown", "").replace("```", "").strip()
-        
-        # 使用正则表达式截断"分析基准时间"那一行之后的内容
-        final_report = truncate_report_at_baseline_time(final_report, current_time_info)
+            # 缓存处理后的报告
+            if final_report:
+                await asyncio.to_thread(_store_cached_report, summary_cache_key, final_report, current_time_info)
 
         logger.info(
             f"{SUCCESS_ICON} SummaryAgent: Final report generated for {company_name} ({stock_code}).")
         logger.debug(f"Final report preview: {final_report[:300]}...")
 
         # 将报告保存到Markdown文件
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-
-        # 处理公司名称和股票代码，确保文件名有意义
-        if stock_code == "Unknown Stock" or stock_code == "Extracted from analysis":
-            # 从用户查询中提取更有意义的名称
-            query_based_name = user_query.replace(
-                " ", "_").replace("分析", "").strip()
-            if not query_based_name:
-                query_based_name = "financial_analysis"
-            safe_file_prefix = f"report_{query_based_name}"
-        else:
-            # 正常情况下使用公司名称和股票代码
-            safe_company_name = company_name.replace(" ", "_").replace(".", "")
-            if safe_company_name == "Unknown_Company" or safe_company_name == "Extracted_from_analysis":
-                safe_company_name = user_query.replace(
-                    " ", "_").replace("分析", "").strip()
-                if not safe_company_name:
-                    safe_company_name = "company"
-
-            # 清理股票代码（移除可能的前缀）
-            clean_stock_code = stock_code.replace("sh.", "").replace("sz.", "")
-            safe_file_prefix = f"report_{safe_company_name}_{clean_stock_code}"
-
-        report_filename = f"{safe_file_prefix}_{timestamp}.md"
+        report_path = os.path.join(REPORTS_DIR, f"report_{report_name}_{timestamp}.md")
 
-        # 确保reports目录存在
-        reports_dir = os.path.join(os.path.dirname(os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__)))), "reports")
-        os.makedirs(reports_dir, exist_ok=True)
-
-        report_path = os.path.join(reports_dir, report_filename)
-
-        # 将报告写入文件
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write(final_report)
-
-        logger.info(
-            f"{SUCCESS_ICON} SummaryAgent: Report saved to {report_path}")
+        # 在线程中开始写入报告文件，与下面的状态更新和执行日志记录并行进行
+        write_task = asyncio.create_task(
+            asyncio.to_thread(_write_report, report_path, final_report))
 
         # 返回更新后的状态，包含最终报告
         current_data["final_report"] = final_report
         current_data["report_path"] = report_path
 
+        if cached_report is None:
+            # 记录LLM交互详情，用于后续分析和优化
+            # 提示词只记录摘要，报告全文见报告文件，执行日志中不再重复保存大段文本
+            log_in_background(
+                execution_logger.log_llm_interaction,
+                agent_name=agent_name,
+                interaction_type="summary_generation",
+                input_messages=[_message_ref("system", system_prompt), _message_ref("user", user_prompt)],
+                output_content=f"<see {report_path}>",
+                model_config=model_config,
+                execution_time=llm_execution_time
+            )
+
         # 记录 Agent执行成功
         total_execution_time = time.time() - agent_start_time
-        execution_logger.log_agent_complete(agent_name, {
+        log_in_background(execution_logger.log_agent_complete, agent_name, {
             "final_report_length": len(final_report),
             "report_path": report_path,
-            "report_preview": final_report,
+            "report_preview": final_report[:REPORT_PREVIEW_CHARS],
             "llm_execution_time": llm_execution_time,
             "total_execution_time": total_execution_time
         }, total_execution_time, True)
 
+        # 返回前确认报告已写入（写入失败时抛出异常，进入下面的错误处理）
+        await write_task
+        logger.info(
+            f"{SUCCESS_ICON} SummaryAgent: Report saved to {report_path}")
+
         return {"data": current_data, "messages": messages}
 
     except Exception as e:
@@ -507,59 +899,29 @@ async def summary_agent(state: AgentState) -> Dict[str, Any]:
         
         ## Available Analysis Fragments:
         
-        - Fundamental Analysis: {"Available" if fundamental_analysis != "Not available" else "Not available"}
-        - Technical Analysis: {"Available" if technical_analysis != "Not available" else "Not available"}
-        - Value Analysis: {"Available" if value_analysis != "Not available" else "Not available"}
-        - News Analysis: {"Available" if news_analysis != "Not available" else "Not available"}
+        - Fundamental Analysis: {"Available" if analyses["fundamental_analysis"] != "Not available" else "Not available"}
+        - Technical Analysis: {"Available" if analyses["technical_analysis"] != "Not available" else "Not available"}
+        - Value Analysis: {"Available" if analyses["value_analysis"] != "Not available" else "Not available"}
+        - News Analysis: {"Available" if analyses["news_analysis"] != "Not available" else "Not available"}
         
         Please review the individual analyses directly for more information.
         """
         current_data["final_report"] = error_report
 
         # 也将错误报告保存到文件
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-
-        # 处理公司名称和股票代码，确保文件名有意义
-        if stock_code == "Unknown Stock" or stock_code == "Extracted from analysis":
-            # 从用户查询中提取更有意义的名称
-            query_based_name = user_query.replace(
-                " ", "_").replace("分析", "").strip()
-            if not query_based_name:
-                query_based_name = "financial_analysis"
-            safe_file_prefix = f"error_report_{query_based_name}"
-        else:
-            # 正常情况下使用公司名称和股票代码
-            safe_company_name = company_name.replace(" ", "_").replace(".", "")
-            if safe_company_name == "Unknown_Company" or safe_company_name == "Extracted_from_analysis":
-                safe_company_name = user_query.replace(
-                    " ", "_").replace("分析", "").strip()
-                if not safe_company_name:
-                    safe_company_name = "company"
-
-            # 清理股票代码（移除可能的前缀）
-            clean_stock_code = stock_code.replace("sh.", "").replace("sz.", "")
-            safe_file_prefix = f"error_report_{safe_company_name}_{clean_stock_code}"
-
-        report_filename = f"{safe_file_prefix}_{timestamp}.md"
-
-        # 确保reports目录存在
-        reports_dir = os.path.join(os.path.dirname(os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__)))), "reports")
-        os.makedirs(reports_dir, exist_ok=True)
-
-        report_path = os.path.join(reports_dir, report_filename)
+        report_path = os.path.join(REPORTS_DIR, f"error_report_{report_name}_{timestamp}.md")
 
-        # 将错误报告写入文件
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write(error_report)
+        # 在线程中将错误报告写入文件
+        await asyncio.to_thread(_write_report, report_path, error_report)
 
         logger.info(
             f"{ERROR_ICON} SummaryAgent: Error report saved to {report_path}")
         current_data["report_path"] = report_path
 
         # 记录 Agent执行失败
-        execution_logger.log_agent_complete(
-            agent_name, current_data, time.time() - agent_start_time, False, str(e))
+        log_in_background(
+            execution_logger.log_agent_complete,
+            agent_name, dict(current_data), time.time() - agent_start_time, False, str(e))
 
         return {"data": current_data, "messages": messages}
 
@@ -594,5 +956,7 @@ async def test_summary_agent():
     return result
 
 if __name__ == "__main__":
-    import asyncio
+    # 环境变量由程序入口（src/main.py）统一加载，单独运行本模块测试时在这里加载.env
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
     asyncio.run(test_summary_agent())
@@ -2,7 +2,6 @@
 TechnicalAnalysis Agent: Performs technical analysis of a stock using ReAct Agent framework.
 技术分析 Agent：使用ReAct Agent框架对股票进行技术分析
 """
-import os
 import json
 from typing import Dict, Any, List, Optional
 from langchain_core.prompts import PromptTemplate
@@ -17,10 +16,7 @@ from src.utils.state_definition import AgentState
 from src.tools.mcp_client import get_mcp_tools
 from src.utils.logging_config import setup_logger, ERROR_ICON, SUCCESS_ICON, WAIT_ICON
 from src.utils.execution_logger import get_execution_logger
-from dotenv import load_dotenv
-
-# 从.env文件加载环境变量
-load_dotenv(override=True)
+from src.utils.llm_config import llm_cfg
 
 logger = setup_logger(__name__)
 
@@ -67,12 +63,11 @@ async def technical_agent(state: AgentState) -> AgentState:
 
     try:
         # 使用API调用
-        api_key = os.getenv("OPENAI_COMPATIBLE_API_KEY")
-        base_url = os.getenv("OPENAI_COMPATIBLE_BASE_URL")
-        model_name = os.getenv("OPENAI_COMPATIBLE_MODEL")
+        cfg = llm_cfg()
+        api_key, base_url, model_name = cfg.api_key, cfg.base_url, cfg.model
 
         # 验证必要的环境变量是否存在
-        if not all([api_key, base_url, model_name]):
+        if not cfg.is_complete:
             logger.error(f"{ERROR_ICON} TechnicalAgent: Missing OpenAI environment variables.")
             current_data["technical_analysis_error"] = "Missing OpenAI environment variables."
             execution_logger.log_agent_complete(agent_name, current_data, time.time() - agent_start_time, False, "Missing OpenAI environment variables")
@@ -277,5 +272,8 @@ async def test_technical_agent():
     return result
 
 if __name__ == "__main__":
+    # 环境变量由程序入口（src/main.py）统一加载，单独运行本模块测试时在这里加载.env
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
     import asyncio
     asyncio.run(test_technical_agent()) 
\ No newline at end of file
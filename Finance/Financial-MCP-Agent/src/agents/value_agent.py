@@ -2,28 +2,153 @@
 ValueAnalysis Agent: Performs valuation analysis of a stock using ReAct Agent framework.
 估值分析 Agent：使用ReAct Agent框架对股票进行估值分析
 """
-import os
-import json
-from typing import Dict, Any, List, Optional
-from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI  # 恢复OpenAI接口调用
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.outputs import ChatResult, ChatGeneration
-from langgraph.prebuilt import create_react_agent
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.callbacks import BaseCallbackHandler
 import time
+from datetime import datetime, timedelta
 
 from src.utils.state_definition import AgentState
-from src.tools.mcp_client import get_mcp_tools
 from src.utils.logging_config import setup_logger, ERROR_ICON, SUCCESS_ICON, WAIT_ICON
-from src.utils.execution_logger import get_execution_logger
-from dotenv import load_dotenv
-
-# 从.env文件加载环境变量
-load_dotenv(override=True)
+from src.utils.execution_logger import get_execution_logger, log_in_background
+from src.utils.llm_config import llm_cfg, get_chat_llm
+from src.utils.analysis_cache import AnalysisCache, make_cache_key
 
 logger = setup_logger(__name__)
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# LLM参数：较低的温度确保分析的一致性，较大的token数量用于详细分析
+LLM_TEMPERATURE = 0.3
+LLM_MAX_TOKENS = 6000
+
+# 提示词版本号，修改估值分析请求后递增以使旧的分析结果缓存失效
+PROMPT_VERSION = "v2"
+
+# 估值分析结果缓存（同一股票、同一分析日期直接复用结果）
+analysis_cache = AnalysisCache("value_agent")
+
+# 批量分析多只股票时的最大并发数
+BATCH_CONCURRENCY = 4
+
+# 估值分析请求模板（模块级常量，每次调用只做 format_map 填充；修改内容后需递增 PROMPT_VERSION）
+_VALUE_PROMPT = """请分析{company_name}（股票代码：{stock_code}）的估值情况。
+
+当前时间：{current_time_info}
+当前日期：{current_date}
+
+请进行以下估值分析：
+1. 获取公司基本信息（市值、股价等）
+2. 获取并分析主要估值指标（市盈率、市净率、市销率等）
+3. 将估值指标与行业平均水平进行对比分析
+4. 分析历史估值水平变化趋势
+5. 获取并分析股息数据和股息收益率
+6. 计算和分析内在价值
+7. 提供估值总结和投资建议
+
+重要限制：请专注于估值指标和财务数据分析，不要使用crawl_news工具获取新闻信息。估值分析应该基于财务指标、估值比率和历史数据，而不是新闻事件。
+
+请使用可用的工具获取实际数据进行分析，而不是基于假设。如果某些数据无法获取，请尝试使用不同的工具或参数组合，基于可用信息提供尽可能全面的分析。请保持回答简洁，避免冗长的描述性文字{prefetched_section}"""
+
+
+class _FinalMessageCollector(BaseCallbackHandler):
+    """在ReAct Agent执行过程中记录最后一次模型回复的内容，执行结束后无需再扫描消息列表"""
+
+    # 在事件循环中同步执行回调，保证记录顺序且不占用线程池
+    run_inline = True
+
+    def __init__(self):
+        self.last_content: Optional[str] = None
+
+    def on_llm_end(self, response, **kwargs):
+        generations = response.generations
+        if generations and generations[-1]:
+            message = getattr(generations[-1][-1], "message", None)
+            if isinstance(message, AIMessage):
+                self.last_content = message.content
+
+
+# 已编译的ReAct Agent缓存：(id(llm), 工具名称) -> (llm, 工具列表, agent)
+# 同时保存llm和工具列表的引用，保证id不会被其他对象复用；工具列表被重新加载后重新创建agent
+_REACT_AGENT_CACHE: Dict[tuple, tuple] = {}
+
+
+def _get_react_agent(llm: ChatOpenAI, mcp_tools: List[Any]):
+    """获取ReAct Agent，相同的LLM实例和工具列表复用已编译的agent图"""
+    key = (id(llm), tuple(sorted(tool.name for tool in mcp_tools)))
+    cached = _REACT_AGENT_CACHE.get(key)
+    if cached is not None and cached[0] is llm and cached[1] is mcp_tools:
+        return cached[2]
+
+    # 较重的依赖（LangGraph预置Agent、MCP适配器）在使用时才导入，缩短模块加载时间
+    from langgraph.prebuilt import create_react_agent
+
+    logger.info(f"{WAIT_ICON} ValueAgent: Creating ReAct agent...")
+    agent = create_react_agent(llm, mcp_tools)
+    _REACT_AGENT_CACHE[key] = (llm, mcp_tools, agent)
+    return agent
+
+
+# 预取历史估值指标的时间窗口（天）
+PREFETCH_HISTORY_DAYS = 180
+
+
+def _prefetch_plan(stock_code: str, current_date: str) -> List[tuple]:
+    """
+    估值分析中互不依赖的取数步骤，返回 (说明, 工具名, 参数) 列表
+
+    公司基本信息、行业分类、历史估值指标和分红数据的参数只取决于股票代码和分析日期，
+    可以在调用ReAct Agent之前并行获取；同业对比、内在价值等依赖前序结果的步骤仍交给Agent完成。
+    """
+    try:
+        end = datetime.strptime(current_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        # 分析日期未知时无法确定时间窗口，只预取与日期无关的数据
+        end = None
+
+    plan = [
+        ("公司基本信息", "get_stock_basic_info", {"code": stock_code}),
+        ("行业分类", "get_stock_industry", {"code": stock_code}),
+    ]
+    if end is not None:
+        start_date = (end - timedelta(days=PREFETCH_HISTORY_DAYS)).strftime("%Y-%m-%d")
+        plan.append(("近半年估值指标（日线）", "get_historical_k_data", {
+            "code": stock_code, "start_date": start_date, "end_date": current_date, "frequency": "d",
+            "fields": ["date", "close", "peTTM", "pbMRQ", "psTTM", "pcfNcfTTM"],
+        }))
+        plan.append(("上一年度分红", "get_dividend_data",
+                     {"code": stock_code, "year": str(end.year - 1)}))
+    return plan
+
+
+async def _prefetch_value_data(mcp_tools: List[Any], stock_code: str, current_date: str) -> str:
+    """
+    并行执行 _prefetch_plan 中的取数步骤
+
+    Returns:
+        拼接好的已获取数据（Markdown小节），工具不存在、调用失败或返回错误的步骤被跳过
+    """
+    tools_by_name = {tool.name: tool for tool in mcp_tools}
+    plan = [step for step in _prefetch_plan(stock_code, current_date) if step[1] in tools_by_name]
+    if not plan:
+        return ""
+
+    results = await asyncio.gather(
+        *(tools_by_name[tool_name].ainvoke(args) for _, tool_name, args in plan),
+        return_exceptions=True)
+
+    sections = []
+    for (label, tool_name, _), result in zip(plan, results):
+        if isinstance(result, BaseException) or (isinstance(result, str) and result.startswith("Error")):
+            logger.warning(f"ValueAgent: Prefetch '{tool_name}' failed: {result}")
+            continue
+        sections.append(f"### {label}（{tool_name}）\n{result}")
+    return "\n\n".join(sections)
+
 
 async def value_agent(state: AgentState) -> AgentState:
     """
@@ -35,6 +160,8 @@ async def value_agent(state: AgentState) -> AgentState:
     Returns:
         更新后的AgentState，包含估值分析结果
     """
+    from src.tools.mcp_client import get_mcp_tools
+
     logger.info(
         f"{WAIT_ICON} ValueAgent: Starting valuation analysis using ReAct framework.")
 
@@ -49,7 +176,7 @@ async def value_agent(state: AgentState) -> AgentState:
     user_query = current_data.get("query")
 
     # 记录 Agent开始执行，包含关键信息
-    execution_logger.log_agent_start(agent_name, {
+    log_in_background(execution_logger.log_agent_start, agent_name, {
         "user_query": user_query,
         "stock_code": current_data.get("stock_code"),
         "company_name": current_data.get("company_name"),
@@ -63,36 +190,73 @@ async def value_agent(state: AgentState) -> AgentState:
         current_data["value_analysis_error"] = "User query is missing."
 
         # 记录 Agent执行失败
-        execution_logger.log_agent_complete(
-            agent_name, current_data, 0, False, "User query is missing")
+        log_in_background(
+            execution_logger.log_agent_complete,
+            agent_name, dict(current_data), 0, False, "User query is missing")
+
+        return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
+
+    # 没有股票代码时无法获取行情和财务数据，直接返回，不调用LLM和MCP工具
+    stock_code = current_data.get('stock_code', 'Unknown')
+    if not stock_code or stock_code == 'Unknown':
+        logger.warning(
+            f"{ERROR_ICON} ValueAgent: Stock code is missing, skipping valuation analysis.")
+        current_data["value_analysis"] = "股票代码缺失，无法进行估值分析"
+        current_data["value_analysis_error"] = "Stock code is missing."
+
+        # 记录 Agent执行失败
+        log_in_background(
+            execution_logger.log_agent_complete,
+            agent_name, dict(current_data), 0, False, "Stock code is missing")
 
         return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
 
     # 记录 Agent开始时间，用于计算执行时长
-    agent_start_time = time.time()
+    agent_start_time = time.perf_counter()
+
+    # 同一股票、同一分析日期已有分析结果时直接复用，跳过LLM和MCP工具调用
+    current_date = current_data.get('current_date', '未知日期')
+    cache_key = None
+    if current_date != "未知日期":
+        cache_key = make_cache_key(stock_code, current_date, PROMPT_VERSION)
+        cached_analysis = await asyncio.to_thread(analysis_cache.get, cache_key)
+        if cached_analysis is not None:
+            logger.info(
+                f"{SUCCESS_ICON} ValueAgent: Using cached valuation analysis.")
+            current_data["value_analysis"] = cached_analysis
+            current_metadata["value_agent_executed"] = True
+            current_metadata["value_agent_cached"] = True
+            current_metadata["value_agent_timestamp"] = str(time.time())
+
+            total_execution_time = time.perf_counter() - agent_start_time
+            log_in_background(execution_logger.log_agent_complete, agent_name, {
+                "value_analysis_length": len(cached_analysis),
+                "cache_hit": True,
+                "total_execution_time": total_execution_time
+            }, total_execution_time, True)
+
+            current_messages.append({"role": "assistant", "content": "估值分析已完成"})
+            return {
+                "data": current_data,
+                "messages": current_messages,
+                "metadata": current_metadata
+            }
 
     try:
         # 使用API调用
-        api_key = os.getenv("OPENAI_COMPATIBLE_API_KEY")
-        base_url = os.getenv("OPENAI_COMPATIBLE_BASE_URL")
-        model_name = os.getenv("OPENAI_COMPATIBLE_MODEL")
+        cfg = llm_cfg()
+        api_key, base_url, model_name = cfg.api_key, cfg.base_url, cfg.model
 
         # 验证必要的环境变量是否存在
-        if not all([api_key, base_url, model_name]):
+        if not cfg.is_complete:
             logger.error(f"{ERROR_ICON} ValueAgent: Missing OpenAI environment variables.")
             current_data["value_analysis_error"] = "Missing OpenAI environment variables."
-            execution_logger.log_agent_complete(agent_name, current_data, time.time() - agent_start_time, False, "Missing OpenAI environment variables")
+            log_in_background(execution_logger.log_agent_complete, agent_name, dict(current_data),
+                              time.perf_counter() - agent_start_time, False, "Missing OpenAI environment variables")
             return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
 
-        logger.info(f"{WAIT_ICON} ValueAgent: Creating ChatOpenAI with model {model_name}")
-        # 创建LLM实例，设置合适的参数
-        llm = ChatOpenAI(
-            model=model_name,
-            api_key=api_key,
-            base_url=base_url,
-            temperature=0.3,  # 较低的温度确保分析的一致性
-            max_tokens=6000   # 增加token数量用于详细分析
-        )
+        # 获取（已缓存的）LLM实例
+        llm = get_chat_llm(LLM_TEMPERATURE, LLM_MAX_TOKENS)
 
         # 2. 获取MCP工具集
         logger.info(f"{WAIT_ICON} ValueAgent: Fetching MCP tools...")
@@ -104,8 +268,8 @@ async def value_agent(state: AgentState) -> AgentState:
                 current_data["value_analysis_error"] = "No MCP tools available."
 
                 # 记录 Agent执行失败
-                execution_logger.log_agent_complete(agent_name, current_data, time.time(
-                ) - agent_start_time, False, "No MCP tools available")
+                log_in_background(execution_logger.log_agent_complete, agent_name, dict(current_data),
+                                  time.perf_counter() - agent_start_time, False, "No MCP tools available")
 
                 return {"data": current_data, "messages": current_messages, "metadata": current_metadata}
 
@@ -116,69 +280,74 @@ async def value_agent(state: AgentState) -> AgentState:
             tool_names = [tool.name for tool in mcp_tools]
             logger.info(f"Available tools: {tool_names}")
 
-            # 3. 创建ReAct Agent - 只传入LLM和工具
-            logger.info(f"{WAIT_ICON} ValueAgent: Creating ReAct agent...")
-            agent = create_react_agent(llm, mcp_tools)
+            # 3. 获取ReAct Agent - 只传入LLM和工具（已编译的agent图会被复用）
+            agent = _get_react_agent(llm, mcp_tools)
 
             # 4. 准备输入数据，构建详细的分析请求
-            stock_code = current_data.get('stock_code', 'Unknown')
             company_name = current_data.get('company_name', 'Unknown')
             current_time_info = current_data.get('current_time_info', '未知时间')
-            current_date = current_data.get('current_date', '未知日期')
-
-            # 构建详细的估值分析请求，包含多个分析维度
-            agent_input = f"""请分析{company_name}（股票代码：{stock_code}）的估值情况。
-
-当前时间：{current_time_info}
-当前日期：{current_date}
 
-请进行以下估值分析：
-1. 获取公司基本信息（市值、股价等）
-2. 获取并分析主要估值指标（市盈率、市净率、市销率等）
-3. 将估值指标与行业平均水平进行对比分析
-4. 分析历史估值水平变化趋势
-5. 获取并分析股息数据和股息收益率
-6. 计算和分析内在价值
-7. 提供估值总结和投资建议
-
-重要限制：请专注于估值指标和财务数据分析，不要使用crawl_news工具获取新闻信息。估值分析应该基于财务指标、估值比率和历史数据，而不是新闻事件。
-
-请使用可用的工具获取实际数据进行分析，而不是基于假设。如果某些数据无法获取，请尝试使用不同的工具或参数组合，基于可用信息提供尽可能全面的分析。请保持回答简洁，避免冗长的描述性文字"""
-
-            logger.info(f"Agent input: {agent_input}")
+            # 并行预取不依赖模型判断的数据，减少ReAct循环中串行的工具调用轮次
+            prefetch_start_time = time.perf_counter()
+            prefetched_data = await _prefetch_value_data(mcp_tools, stock_code, current_date)
+            logger.info(
+                f"{SUCCESS_ICON} ValueAgent: Prefetch finished in {time.perf_counter() - prefetch_start_time:.2f}s")
+            prefetched_section = (
+                f"\n\n以下数据已预先获取，请直接使用，无需再调用对应的工具：\n\n{prefetched_data}"
+                if prefetched_data else "")
+
+            # 填充估值分析请求，包含多个分析维度
+            agent_input = _VALUE_PROMPT.format_map({
+                "company_name": company_name,
+                "stock_code": stock_code,
+                "current_time_info": current_time_info,
+                "current_date": current_date,
+                "prefetched_section": prefetched_section,
+            })
+
+            logger.debug("Agent input: %s", agent_input)
 
             # 5. 调用ReAct Agent - 使用正确的messages格式
             logger.info(f"{WAIT_ICON} ValueAgent: Calling ReAct agent...")
-            start_time = time.time()
+            start_time = time.perf_counter()
 
             # LangGraph ReAct Agent需要messages格式的输入
             input_data = {
                 "messages": [HumanMessage(content=agent_input)]
             }
 
-            # 调用 Agent执行分析
-            response = await agent.ainvoke(input_data)
+            # 以流式方式执行 Agent，每完成一步（模型回复或工具调用）得到一次完整状态，最后一次即为最终状态
+            # 回调在执行过程中记录最后一条AI消息，作为最终的分析结果
+            collector = _FinalMessageCollector()
+            response = {}
+            step_count = 0
+            async for state_snapshot in agent.astream(
+                    input_data, config={"callbacks": [collector]}, stream_mode="values"):
+                response = state_snapshot
+                step_count += 1
+                logger.debug("ValueAgent: ReAct step %d, messages so far: %d",
+                             step_count, len(state_snapshot.get("messages", [])))
 
-            end_time = time.time()
-            execution_time = end_time - start_time
+            execution_time = time.perf_counter() - start_time
 
-            logger.info(
-                f"ReAct agent execution completed in {execution_time:.2f} seconds")
+            logger.info("ReAct agent execution completed in %.2f seconds", execution_time)
 
             # 6. 提取分析结果
             final_output = "No analysis generated."
 
-            if "messages" in response and isinstance(response["messages"], list):
+            if collector.last_content is not None:
+                final_output = collector.last_content
+                logger.info(
+                    f"Successfully extracted analysis from AI message.")
+            elif "messages" in response and isinstance(response["messages"], list):
                 messages = response["messages"]
                 logger.info(f"Response messages count: {len(messages)}")
                 
-                # 查找最后一条AI消息，这通常包含最终的分析结果
-                ai_messages = [
-                    msg for msg in messages if isinstance(msg, AIMessage)]
-                logger.info(f"AI messages count: {len(ai_messages)}")
-                
-                if ai_messages:
-                    last_ai_message = ai_messages[-1]
+                # 从后向前查找最后一条AI消息，这通常包含最终的分析结果
+                last_ai_message = next(
+                    (msg for msg in reversed(messages) if isinstance(msg, AIMessage)), None)
+
+                if last_ai_message is not None:
                     final_output = last_ai_message.content
                     logger.info(
                         f"Successfully extracted analysis from AI message.")
@@ -198,16 +367,17 @@ async def value_agent(state: AgentState) -> AgentState:
 
             logger.info(
                 f"Final extracted analysis length: {len(final_output)} characters")
-            print(f"VALUEAGENT: {final_output}")
+            logger.debug("VALUEAGENT output: %s", final_output)
             # 7. 记录LLM交互，用于后续分析和优化
             model_config = {
                 "model": model_name,
-                "temperature": 0.3,
-                "max_tokens": 6000,
+                "temperature": LLM_TEMPERATURE,
+                "max_tokens": LLM_MAX_TOKENS,
                 "api_base": base_url
             }
             
-            execution_logger.log_llm_interaction(
+            log_in_background(
+                execution_logger.log_llm_interaction,
                 agent_name=agent_name,
                 interaction_type="react_agent",
                 input_messages=[{"role": "user", "content": agent_input}],
@@ -223,15 +393,19 @@ async def value_agent(state: AgentState) -> AgentState:
             current_data["value_analysis"] = final_output
             current_metadata["value_agent_executed"] = True
             current_metadata["value_agent_timestamp"] = str(time.time())
-            current_metadata["value_agent_execution_time"] = f"{execution_time:.2f} seconds"
+            current_metadata["value_agent_execution_time_s"] = execution_time
+
+            # 只缓存成功生成的分析结果
+            if cache_key and final_output != "No analysis generated.":
+                await asyncio.to_thread(analysis_cache.set, cache_key, final_output)
 
             # 9. 添加消息记录，保持对话历史
-            new_message = {"role": "assistant", "content": "估值分析已完成"}
-            updated_messages = current_messages + [new_message]
+            # 工作流为每个分析智能体复制了消息列表（见 main.parallel_analysts），直接追加而不复制整个历史
+            current_messages.append({"role": "assistant", "content": "估值分析已完成"})
 
             # 记录 Agent执行成功
-            total_execution_time = time.time() - agent_start_time
-            execution_logger.log_agent_complete(agent_name, {
+            total_execution_time = time.perf_counter() - agent_start_time
+            log_in_background(execution_logger.log_agent_complete, agent_name, {
                 "value_analysis_length": len(final_output),
                 "analysis_preview": final_output[:500] if len(final_output) > 500 else final_output,
                 "llm_execution_time": execution_time,
@@ -240,7 +414,7 @@ async def value_agent(state: AgentState) -> AgentState:
 
             return {
                 "data": current_data,
-                "messages": updated_messages,
+                "messages": current_messages,
                 "metadata": current_metadata
             }
 
@@ -252,8 +426,9 @@ async def value_agent(state: AgentState) -> AgentState:
             current_metadata["value_agent_error"] = str(e)
 
             # 记录 Agent执行失败
-            execution_logger.log_agent_complete(
-                agent_name, current_data, time.time() - agent_start_time, False, str(e))
+            log_in_background(
+                execution_logger.log_agent_complete,
+                agent_name, dict(current_data), time.perf_counter() - agent_start_time, False, str(e))
 
             return {
                 "data": current_data,
@@ -268,8 +443,9 @@ async def value_agent(state: AgentState) -> AgentState:
         current_metadata["value_agent_error"] = str(e)
 
         # 记录 Agent执行失败
-        execution_logger.log_agent_complete(
-            agent_name, current_data, time.time() - agent_start_time, False, str(e))
+        log_in_background(
+            execution_logger.log_agent_complete,
+            agent_name, dict(current_data), time.perf_counter() - agent_start_time, False, str(e))
 
         return {
             "data": current_data,
@@ -278,6 +454,30 @@ async def value_agent(state: AgentState) -> AgentState:
         }
 
 
+async def value_agent_batch(states: List[AgentState],
+                            max_concurrency: int = BATCH_CONCURRENCY) -> List[AgentState]:
+    """
+    并发分析多只股票的估值
+
+    LLM客户端、MCP工具列表和编译好的ReAct Agent均已在模块级缓存，各股票的分析共享同一份；
+    通过信号量限制同时进行的分析数量。
+
+    Args:
+        states: 每只股票对应的AgentState
+        max_concurrency: 最大并发数
+
+    Returns:
+        与输入顺序一致的分析结果列表
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(state: AgentState) -> AgentState:
+        async with semaphore:
+            return await value_agent(state)
+
+    return await asyncio.gather(*(_run(state) for state in states))
+
+
 # 本地测试函数
 async def test_value_agent():
     """估值分析 Agent的测试函数"""
@@ -318,5 +518,8 @@ async def test_value_agent():
     return result
 
 if __name__ == "__main__":
+    # 环境变量由程序入口（src/main.py）统一加载，单独运行本模块测试时在这里加载.env
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
     import asyncio
     asyncio.run(test_value_agent())
@@ -10,7 +10,7 @@
 5. 报告生成：生成综合性的金融分析报告
 
 工作流程：
-start_node → [fundamental_analyst, technical_analyst, value_analyst] → summarizer → END
+analysts（并发执行 fundamental / technical / value / news 四个分析智能体） → summarizer → END
 """
 
 # ============================================================================
@@ -39,24 +39,21 @@ logging.getLogger("urllib3").setLevel(logging.ERROR)
 # 日志和状态管理相关导入
 from src.utils.logging_config import setup_logger, SUCCESS_ICON, ERROR_ICON, WAIT_ICON
 from src.utils.state_definition import AgentState
-from src.utils.execution_logger import initialize_execution_logger, finalize_execution_logger, get_execution_logger
+from src.utils.execution_logger import initialize_execution_logger, finalize_execution_logger, get_execution_logger, flush_background_logs
 
-# 智能体模块导入 - 五个核心分析智能体
-from src.agents.summary_agent import summary_agent      # 总结智能体：整合所有分析结果
-from src.agents.value_agent import value_agent          # 估值智能体：分析股票估值水平
-from src.agents.technical_agent import technical_agent  # 技术分析智能体：分析价格趋势和技术指标
-from src.agents.fundamental_agent import fundamental_agent  # 基本面智能体：分析财务状况和盈利能力
-from src.agents.news_agent import news_agent            # 新闻分析智能体：分析新闻情感和风险
+# 智能体模块、MCP客户端和LangGraph导入较慢，推迟到 main() 真正开始分析时再导入（见 get_analyst_agents / get_app），
+# 使查看帮助信息或输入校验失败等提前退出的路径不必承担这部分启动开销
 
-# LangGraph工作流框架导入
-from langgraph.graph import StateGraph, END
-
-# 环境变量和系统相关导入
-from dotenv import load_dotenv
+# 系统相关导入
 import argparse
 import asyncio
+import functools
+import inspect
 import re
+import threading
+import time
 from datetime import datetime
+from typing import Any, Dict, List
 
 # ============================================================================
 # 初始化和配置
@@ -65,378 +62,437 @@ from datetime import datetime
 # 设置日志记录器
 logger = setup_logger(__name__)
 
-# 添加项目根目录到Python路径，确保模块导入正常工作
-sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
-# 加载环境变量（从.env文件）
-load_dotenv(override=True)
+@functools.lru_cache(maxsize=1)
+def get_analyst_agents():
+    """
+    导入四个分析智能体模块，返回并发执行的分析智能体列表
+
+    Returns:
+        (节点名称, 智能体函数, 结果键) 元组
+    """
+    from src.agents.value_agent import value_agent          # 估值智能体：分析股票估值水平
+    from src.agents.technical_agent import technical_agent  # 技术分析智能体：分析价格趋势和技术指标
+    from src.agents.fundamental_agent import fundamental_agent  # 基本面智能体：分析财务状况和盈利能力
+    from src.agents.news_agent import news_agent            # 新闻分析智能体：分析新闻情感和风险
+    return (
+        ("fundamental_analyst", fundamental_agent, "fundamental_analysis"),
+        ("technical_analyst", technical_agent, "technical_analysis"),
+        ("value_analyst", value_agent, "value_analysis"),
+        ("news_analyst", news_agent, "news_analysis"),
+    )
 
-# 调试：打印关键环境变量以验证配置
-logger.info(f"Environment Variables Loaded:")
-logger.info(
-    f"  OPENAI_COMPATIBLE_MODEL: {os.getenv('OPENAI_COMPATIBLE_MODEL', 'Not Set')}")
-logger.info(
-    f"  OPENAI_COMPATIBLE_BASE_URL: {os.getenv('OPENAI_COMPATIBLE_BASE_URL', 'Not Set')}")
-logger.info(
-    f"  OPENAI_COMPATIBLE_API_KEY: {'*' * 20 if os.getenv('OPENAI_COMPATIBLE_API_KEY') else 'Not Set'}")
 
-# 重新设置日志记录器（确保正确配置）
-logger = setup_logger(__name__)
+# 星期几的中文名称，按 datetime.weekday() 的顺序（星期一为0）
+_WEEKDAYS_CN = ("星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日")
 
 
-async def main():
+def build_time_ctx(now: datetime = None) -> dict:
     """
-    主函数：金融分析智能体系统的核心执行逻辑
-    
-    功能包括：
-    1. 初始化执行日志系统
-    2. 构建LangGraph工作流
-    3. 处理命令行参数和用户输入
-    4. 提取股票信息（代码、公司名称）
-    5. 执行多智能体分析工作流
-    6. 生成和保存分析报告
-    7. 错误处理和日志记录
+    构建一次查询共用的时间信息，所有分析智能体使用同一个"当前时间"
+
+    只调用一次strftime，其余格式由切片拼接得到。格式串中不直接使用"年/月/日"等非ASCII字符，
+    Windows下部分区域设置的strftime无法处理这类字符。
+
+    Returns:
+        包含 current_date / current_date_cn / current_time / current_weekday_cn /
+        current_time_info / analysis_timestamp 的字典
     """
-    
-    # 初始化执行日志系统
-    execution_logger = initialize_execution_logger()
-    logger.info(
-        f"{SUCCESS_ICON} 执行日志系统已初始化，日志目录: {execution_logger.execution_dir}")
+    now = now or datetime.now()
+    stamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    current_date_en = stamp[:10]
+    current_date_cn = f"{stamp[:4]}年{stamp[5:7]}月{stamp[8:10]}日"
+    current_time = stamp[11:]
+    current_weekday_cn = _WEEKDAYS_CN[now.weekday()]
+    return {
+        "current_date": current_date_en,
+        "current_date_cn": current_date_cn,
+        "current_time": current_time,
+        "current_weekday_cn": current_weekday_cn,
+        "current_time_info": f"{current_date_cn} ({current_date_en}) {current_weekday_cn} {current_time}",
+        "analysis_timestamp": now.isoformat()
+    }
 
-    try:
-        # ============================================================================
-        # 1. 定义LangGraph工作流 
-        # ============================================================================
-        
-        # 创建工作流图，使用AgentState作为状态类型
-        workflow = StateGraph(AgentState)
 
-        # 添加起始节点 - 作为并行分支的清晰起点
-        workflow.add_node("start_node", lambda state: state)
+# ============================================================================
+# 股票信息提取模式（模块加载时编译一次，按优先级排列）
+# ============================================================================
+
+# 每个模式都带有一个触发关键词（模式能够匹配的必要条件），查询中不包含该关键词时直接跳过，
+# 用一次子串查找代替正则回溯扫描；None表示该模式没有固定关键词，总是执行匹配
+
+# 同时包含公司名称和股票代码的模式：(触发关键词, 模式, 公司名称分组, 股票代码分组)，命中即返回
+_NAME_AND_CODE_PATTERNS = (
+    # 模式1: 包含"请帮我分析一下"的复杂查询，如"请帮我分析一下嘉友国际(603871)这只股票的投资价值如何"
+    ('请帮我分析一下', re.compile(r'请帮我分析一下\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'), 1, 2),
+    # 模式2: 包含"分析一下"的复杂查询，如"分析一下嘉友国际(603871)的财务状况"
+    ('分析一下', re.compile(r'分析一下\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'), 1, 2),
+    # 模式3: 股票代码在括号内，如"分析嘉友国际(603871)"
+    ('分析', re.compile(r'分析\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'), 1, 2),
+    # 模式4: 股票代码在括号内，如"分析(603871)嘉友国际"
+    ('分析', re.compile(r'分析\s*[（(](\d{5,6})[)）]\s*([^）)]+)'), 2, 1),
+    # 模式5: 包含"帮我看看"的查询，如"帮我看看(000001)平安银行这只股票"
+    ('帮我看看', re.compile(r'帮我看看\s*[（(](\d{5,6})[)）]\s*([^）)]+?)(?:\s*这只|\s*这个)?\s*股票'), 2, 1),
+    # 模式6: 包含"我想了解一下"的查询，如"我想了解一下比亚迪(002594)的投资价值"
+    ('我想了解一下', re.compile(r'我想了解一下\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'), 1, 2),
+    # 模式7: 包含"帮我看看"的复杂查询，如"帮我看看茅台(600519)这只股票值得投资吗"
+    ('帮我看看', re.compile(r'帮我看看\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'), 1, 2),
+    # 模式8: 直接公司名+括号格式，如"平安银行(000001)值得买吗"
+    (None, re.compile(r'^([^（(]+?)\s*[（(](\d{5,6})[)）]'), 1, 2),
+)
+
+# 模式1-8都要求括号内的股票代码；查询中没有这样的代码时整组跳过，
+# 避免每个触发关键词位置都把公司名称分组扫描到查询末尾
+_BRACKETED_CODE_RE = re.compile(r'[（(]\d{5,6}[)）]')
+
+# 只包含公司名称的模式：(触发关键词, 模式)，依次尝试，取第一个提取到非空名称的模式
+# 公司名称分组前的 (?<![^0-9（）()\s]) 使匹配只从一段连续文字的开头尝试：从段内其他位置开始能匹配时，
+# 从段首开始同样能匹配，结果不变，但段内的每个位置不会再各自把分组扫描到段尾（否则耗时随查询长度平方增长）
+# 模式15/16的公司名称除首字外不跨过"在"：同一段文字中第一个"在"之后找不到"中"时，后面的"在"之后同样找不到，
+# 不必再逐个重试，结果不变而耗时随查询长度线性增长
+_COMPANY_NAME_PATTERNS = (
+    # 模式9: 包含"分析一下"的查询，如"分析一下宁德时代的财务状况"
+    ('分析一下', re.compile(r'分析一下\s*([^0-9（）()\s]+?)(?:\s*的|\s|$)')),
+    # 模式10: 包含"分析"关键词，如"分析嘉友国际"
+    ('分析', re.compile(r'分析\s*([^0-9（）()\s]+)')),
+    # 模式11: 包含"股票"关键词的查询，如"嘉友国际这只股票怎么样"
+    ('股票', re.compile(r'(?<![^0-9（）()\s])([^0-9（）()\s]+)\s*(?:这只|这个|的)?\s*股票')),
+    # 模式12: 包含"投资价值"的查询，如"了解一下腾讯的投资价值"
+    ('了解一下', re.compile(r'了解一下\s*([^0-9（）()\s]+?)(?:\s*的|\s|$)')),
+    # 模式13: 包含"给我分析一下"的查询，如"给我分析一下宁德时代的财务状况"
+    ('给我分析一下', re.compile(r'给我分析一下\s*([^0-9（）()\s]+?)(?:\s*的|\s|$)')),
+    # 模式14: 包含"的"字的查询，如"嘉友国际的财务表现如何"
+    ('的', re.compile(r'(?<![^0-9（）()\s])([^0-9（）()\s]+?)\s*的\s*(?:财务表现|盈利能力|现金流状况|资产负债情况|技术面|股价走势|技术指标|技术面表现|估值水平|市盈率|市净率|估值|投资风险|风险因素|风险评估|投资价值|股票|基本面情况|基本面|财务状况)')),
+    # 模式15: 包含"在...中"的查询（无"的"字），如"比亚迪在新能源汽车行业的表现"
+    ('在', re.compile(r'(?<![^0-9（）()\s])([^0-9（）()\s][^0-9（）()\s在]*?)\s*在\s*[^0-9（）()\s]*\s*中')),
+    # 模式16: 包含"在...中"的查询，如"嘉友国际在行业中的地位"
+    ('在', re.compile(r'(?<![^0-9（）()\s])([^0-9（）()\s][^0-9（）()\s在]*?)\s*在\s*[^0-9（）()\s]*\s*中\s*的')),
+    # 模式17: 包含"面临"的查询，如"比亚迪面临的主要风险"
+    ('面临', re.compile(r'(?<![^0-9（）()\s])([^0-9（）()\s]+?)\s*面临')),
+)
+
+# 只包含股票代码的模式：(触发关键词, 模式)，依次尝试，取第一个匹配的模式
+_STOCK_CODE_PATTERNS = (
+    # 模式18: 直接包含5-6位数字股票代码
+    (None, re.compile(r'\b(\d{5,6})\b')),
+    # 模式19: 包含"值得买"的查询，如"603871 这个股票值得买吗"
+    ('值得买', re.compile(r'(\d{5,6})\s*(?:这个|这只)?\s*股票\s*值得买')),
+    # 模式20: 包含"这个股票最近表现"的查询，如"603871这个股票最近表现怎么样，值得投资吗"
+    ('最近表现', re.compile(r'(\d{5,6})\s*这个\s*股票\s*最近表现')),
+)
+
+# 清理公司名称时移除的无意义词汇
+_STOP_WORDS = ('的', '这个', '这只', '一下', '看看', '了解', '分析', '帮我', '我想', '给我', '财务状况', '投资价值', '基本面情况', '这只股票', '这个股票')
+
+# 所有无意义词汇合并成一个正则，一次扫描全部移除；按长度降序排列，使"这只股票"优先于"这只"匹配
+_STOP_WORD_RE = re.compile('|'.join(sorted(map(re.escape, _STOP_WORDS), key=len, reverse=True)))
+
+# 股票代码首位到交易所前缀的映射：6开头为上海证券交易所，0/3开头为深圳证券交易所
+_EXCH_PREFIX = {"6": "sh.", "0": "sz.", "3": "sz."}
+
+
+@functools.lru_cache(maxsize=512)
+def extract_stock_info(query: str):
+    """
+    精确提取股票代码和公司名称
+
+    结果只取决于查询文本，按查询缓存：同一查询重复提交（重试、脚本循环）时直接返回上次的结果。
+
+    Returns:
+        (company_name, stock_code) 元组，未提取到的项为None
+    """
+    stock_code = None
+    company_name = None
+
+    # 模式1-8: 公司名称和股票代码同时出现，命中即返回
+    if _BRACKETED_CODE_RE.search(query):
+        for trigger, pattern, name_group, code_group in _NAME_AND_CODE_PATTERNS:
+            if trigger and trigger not in query:
+                continue
+            match = pattern.search(query)
+            if match:
+                return match.group(name_group).strip(), match.group(code_group)
+
+    # 模式9-17: 提取公司名称
+    for trigger, pattern in _COMPANY_NAME_PATTERNS:
+        if trigger and trigger not in query:
+            continue
+        match = pattern.search(query)
+        if match:
+            company_name = match.group(1).strip()
+            if company_name:
+                break
+
+    # 模式18-20: 提取股票代码
+    for trigger, pattern in _STOCK_CODE_PATTERNS:
+        if trigger and trigger not in query:
+            continue
+        match = pattern.search(query)
+        if match:
+            stock_code = match.group(1)
+            break
+
+    # 清理公司名称（移除常见的无意义词汇）
+    if company_name:
+        # 移除常见的无意义词汇
+        company_name = _STOP_WORD_RE.sub('', company_name).strip()
+
+        # 如果公司名称太短（少于2个字符），可能是误匹配
+        if len(company_name) < 2:
+            company_name = None
+
+    return company_name, stock_code
+
+
+def _copy_state(messages: List[Any], data: Dict[str, Any], metadata: Dict[str, Any]) -> AgentState:
+    """复制状态的顶层容器，避免并发执行的智能体修改同一个data/metadata字典"""
+    return {"messages": list(messages), "data": dict(data), "metadata": dict(metadata)}
+
+
+async def _run_analyst(agent, state: AgentState) -> AgentState:
+    """运行单个分析智能体；同步实现的智能体放到线程池中执行，避免阻塞事件循环、拖慢其他智能体"""
+    if inspect.iscoroutinefunction(agent):
+        return await agent(state)
+    return await asyncio.to_thread(agent, state)
+
+
+async def parallel_analysts(state: AgentState) -> AgentState:
+    """
+    使用asyncio.gather并发执行四个分析智能体，并合并它们返回的状态
+
+    每个智能体使用独立的状态副本；单个智能体抛出异常时只记录对应的错误信息，不影响其他智能体。
+    返回的messages只包含各智能体新增的消息（AgentState中messages的合并方式为追加）。
+    """
+    # 状态的三个字段只读取一次，后续复制和合并都使用局部变量
+    messages = state.get("messages", [])
+    data = state.get("data", {})
+    metadata = state.get("metadata", {})
+
+    analyst_agents = get_analyst_agents()
+    base_message_count = len(messages)
+    start_time = time.perf_counter()
+    results = await asyncio.gather(
+        *(_run_analyst(agent, _copy_state(messages, data, metadata)) for _, agent, _ in analyst_agents),
+        return_exceptions=True)
+    # 并发执行的总耗时约等于最慢的智能体耗时，而不是各智能体耗时之和
+    logger.info(f"{SUCCESS_ICON} {len(analyst_agents)} analysts finished in {time.perf_counter() - start_time:.2f}s")
+
+    merged_data = dict(data)
+    merged_metadata = dict(metadata)
+    new_messages = []
+    for (node_name, _, result_key), result in zip(analyst_agents, results):
+        if isinstance(result, BaseException):
+            logger.error(f"{ERROR_ICON} {node_name} failed: {result}", exc_info=result)
+            merged_data[f"{result_key}_error"] = f"Error during execution: {result}"
+            continue
+        merged_data.update(result.get("data", {}))
+        merged_metadata.update(result.get("metadata", {}))
+        new_messages.extend(result.get("messages", [])[base_message_count:])
+
+    return {"data": merged_data, "messages": new_messages, "metadata": merged_metadata}
+
+
+@functools.lru_cache(maxsize=1)
+def get_app():
+    """
+    构建并编译LangGraph工作流
+
+    工作流结构不依赖任何运行时输入，编译结果在进程内缓存复用，多次调用 main() 时不再重复构建。
+    """
+    # LangGraph工作流框架和总结智能体在第一次构建工作流时导入
+    from langgraph.graph import StateGraph, END
+    from src.agents.summary_agent import summary_agent      # 总结智能体：整合所有分析结果
+
+    # 创建工作流图，使用AgentState作为状态类型
+    workflow = StateGraph(AgentState)
+
+    # 添加智能体节点
+    # 四个分析智能体（基本面、技术、估值、新闻）在同一个节点内通过asyncio.gather并发执行
+    workflow.add_node("analysts", parallel_analysts)
+    workflow.add_node("summarizer", summary_agent)              # 总结智能体
+
+    # 设置工作流入口点
+    workflow.set_entry_point("analysts")
+
+    # 所有分析结果合并后交给总结智能体
+    workflow.add_edge("analysts", "summarizer")
+
+    # 添加结束边 - 总结智能体完成后结束工作流
+    workflow.add_edge("summarizer", END)
+
+    # 编译工作流
+    return workflow.compile()
+
 
-        # 添加五个核心智能体节点
-        workflow.add_node("fundamental_analyst", fundamental_agent)  # 基本面分析智能体
-        workflow.add_node("technical_analyst", technical_agent)      # 技术分析智能体
-        workflow.add_node("value_analyst", value_agent)             # 估值分析智能体
-        workflow.add_node("news_analyst", news_agent)               # 新闻分析智能体
-        workflow.add_node("summarizer", summary_agent)              # 总结智能体
+async def _ainput(prompt: str) -> str:
+    """
+    在后台线程中读取一行用户输入，等待输入期间事件循环继续运行后台任务（如MCP工具预热）
+
+    使用独立的守护线程而不是 asyncio.to_thread：默认线程池在事件循环关闭时会等待所有线程结束，
+    用户在输入阶段按 Ctrl+C 退出时程序会卡在 input() 上，直到再按一次回车。
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _resolve(line, error):
+        if future.done():
+            return
+        if error is None:
+            future.set_result(line)
+        else:
+            future.set_exception(error)
+
+    def _reader():
+        try:
+            line, error = input(prompt), None
+        except BaseException as e:  # EOFError（输入流已关闭）等异常交给调用方处理
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(_resolve, line, error)
+        except RuntimeError:
+            pass  # 事件循环已关闭，输入不再需要
+
+    threading.Thread(target=_reader, name="stdin-reader", daemon=True).start()
+    return await future
+
+
+# 交互模式下的开屏图像和使用说明，拼接成一个字符串一次写入标准输出
+_BANNER = """
+
+╔══════════════════════════════════════════════════════════════════════════════╗
+║                                                                              ║
+║      ███████╗██╗███╗   ██╗ █████╗ ███╗   ██╗ ██████╗██╗ █████╗ ██╗          ║
+║      ██╔════╝██║████╗  ██║██╔══██╗████╗  ██║██╔════╝██║██╔══██╗██║          ║
+║      █████╗  ██║██╔██╗ ██║███████║██╔██╗ ██║██║     ██║███████║██║          ║
+║      ██╔══╝  ██║██║╚██╗██║██╔══██║██║╚██╗██║██║     ██║██╔══██║██║          ║
+║      ██║     ██║██║ ╚████║██║  ██║██║ ╚████║╚██████╗██║██║  ██║███████╗      ║
+║      ╚═╝     ╚═╝╚═╝  ╚═══╝╚═╝  ╚═╝╚═╝  ╚═══╝ ╚═════╝╚═╝╚═╝  ╚═╝╚══════╝      ║
+║                                                                              ║
+║                █████╗  ██████╗ ███████╗███╗   ██╗████████╗                  ║
+║               ██╔══██╗██╔════╝ ██╔════╝████╗  ██║╚══██╔══╝                  ║
+║               ███████║██║  ███╗█████╗  ██╔██╗ ██║   ██║                     ║
+║               ██╔══██║██║   ██║██╔══╝  ██║╚██╗██║   ██║                     ║
+║               ██║  ██║╚██████╔╝███████╗██║ ╚████║   ██║                     ║
+║               ╚═╝  ╚═╝ ╚═════╝ ╚══════╝╚═╝  ╚═══╝   ╚═╝                     ║
+║                                                                              ║
+║                          🏦 金融分析智能体系统                              ║
+║                     Financial Analysis AI Agent System                      ║
+║                                                                              ║
+║    ┌─────────────────────────────────────────────────────────────────┐     ║
+║    │  📊 基本面分析  │  📈 技术分析  │  💰 估值分析  │  📰 新闻分析  │  🤖 智能总结  │    ║
+║    └─────────────────────────────────────────────────────────────────┘     ║
+║                                                                              ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+🔹 本系统可以对A股公司进行全面分析，包括：
+  • 基本面分析 - 财务状况、盈利能力和行业地位
+  • 技术面分析 - 价格趋势、交易量和技术指标
+  • 估值分析 - 市盈率、市净率等估值水平
+  • 新闻分析 - 新闻情感分析和风险评估
+
+🔹 支持多种自然语言查询方式：
+  • 分析嘉友国际
+  • 帮我看看比亚迪这只股票怎么样
+  • 我想了解一下腾讯的投资价值
+  • 603871 这个股票值得买吗？
+  • 给我分析一下宁德时代的财务状况
+
+🔹 您可以用任何自然语言描述您的分析需求
+🔹 系统会自动识别股票名称和代码，并进行全面分析
+
+💡 提示：建议使用股票代码（如 000001、600036）以获得更准确的分析结果
+""" + "\n" + "─" * 78 + "\n\n"
+
+
+# 命令行参数解析器，在模块级别创建一次
+_PARSER = argparse.ArgumentParser(description="Financial Agent CLI")
+_PARSER.add_argument(
+    "--command",
+    type=str,
+    required=False,  # 改为非必需，支持交互式输入
+    help="The user query for financial analysis (e.g., '分析嘉友国际')"
+)
 
-        # 设置工作流入口点
-        workflow.set_entry_point("start_node")
 
-        # 添加并行执行边 - 四个分析智能体并行执行
-        workflow.add_edge("start_node", "fundamental_analyst")
-        workflow.add_edge("start_node", "technical_analyst")
-        workflow.add_edge("start_node", "value_analyst")
-        workflow.add_edge("start_node", "news_analyst")
+async def main():
+    """
+    主函数：金融分析智能体系统的核心执行逻辑
+    
+    功能包括：
+    1. 初始化执行日志系统
+    2. 处理命令行参数和用户输入
+    3. 提取股票信息（代码、公司名称）
+    4. 获取（已编译的）LangGraph工作流并执行多智能体分析
+    5. 生成和保存分析报告
+    6. 错误处理和日志记录
+    """
 
-        # 添加汇聚边 - 所有分析结果汇聚到总结智能体
-        # LangGraph确保"summarizer"等待所有直接前驱节点完成
-        workflow.add_edge("fundamental_analyst", "summarizer")
-        workflow.add_edge("technical_analyst", "summarizer")
-        workflow.add_edge("value_analyst", "summarizer")
-        workflow.add_edge("news_analyst", "summarizer")
+    # 先解析命令行参数：--help 或参数错误时直接退出，不创建日志目录、不启动MCP服务器
+    args = _PARSER.parse_args()
+    if not args.command and not sys.stdin.isatty():
+        _PARSER.error("--command required in non-interactive mode")
 
-        # 添加结束边 - 总结智能体完成后结束工作流
-        workflow.add_edge("summarizer", END)
+    # 初始化执行日志系统（设置 ARCHIVE_LLM_INTERACTIONS=1 时压缩归档较早执行的LLM交互日志）
+    execution_logger = initialize_execution_logger(
+        archive_interactions=os.getenv("ARCHIVE_LLM_INTERACTIONS", "0") == "1")
+    logger.info(
+        f"{SUCCESS_ICON} 执行日志系统已初始化，日志目录: {execution_logger.execution_dir}")
 
-        # 编译工作流
-        app = workflow.compile()
+    # 在后台提前启动MCP服务器并加载工具列表，与用户输入、查询解析等准备工作重叠进行
+    from src.tools.mcp_client import prewarm_mcp_tools
+    prewarm_mcp_tools()
 
+    try:
         # ============================================================================
-        # 2. 实现命令行界面 
+        # 1. 实现命令行界面 
         # ============================================================================
-        
-        # 创建命令行参数解析器
-        parser = argparse.ArgumentParser(description="Financial Agent CLI")
-        parser.add_argument(
-            "--command",
-            type=str,
-            required=False,  # 改为非必需，支持交互式输入
-            help="The user query for financial analysis (e.g., '分析嘉友国际')"
-        )
-        args = parser.parse_args()
 
         # 处理用户查询输入
         if args.command:
             # 如果通过命令行参数提供查询
             user_query = args.command
         else:
-            # 显示ASCII艺术开屏图像和交互式界面
-            print("\n")
-            print(
-                "╔══════════════════════════════════════════════════════════════════════════════╗")
-            print(
-                "║                                                                              ║")
-            print(
-                "║      ███████╗██╗███╗   ██╗ █████╗ ███╗   ██╗ ██████╗██╗ █████╗ ██╗          ║")
-            print(
-                "║      ██╔════╝██║████╗  ██║██╔══██╗████╗  ██║██╔════╝██║██╔══██╗██║          ║")
-            print(
-                "║      █████╗  ██║██╔██╗ ██║███████║██╔██╗ ██║██║     ██║███████║██║          ║")
-            print(
-                "║      ██╔══╝  ██║██║╚██╗██║██╔══██║██║╚██╗██║██║     ██║██╔══██║██║          ║")
-            print(
-                "║      ██║     ██║██║ ╚████║██║  ██║██║ ╚████║╚██████╗██║██║  ██║███████╗      ║")
-            print(
-                "║      ╚═╝     ╚═╝╚═╝  ╚═══╝╚═╝  ╚═╝╚═╝  ╚═══╝ ╚═════╝╚═╝╚═╝  ╚═╝╚══════╝      ║")
-            print(
-                "║                                                                              ║")
-            print(
-                "║                █████╗  ██████╗ ███████╗███╗   ██╗████████╗                  ║")
-            print(
-                "║               ██╔══██╗██╔════╝ ██╔════╝████╗  ██║╚══██╔══╝                  ║")
-            print(
-                "║               ███████║██║  ███╗█████╗  ██╔██╗ ██║   ██║                     ║")
-            print(
-                "║               ██╔══██║██║   ██║██╔══╝  ██║╚██╗██║   ██║                     ║")
-            print(
-                "║               ██║  ██║╚██████╔╝███████╗██║ ╚████║   ██║                     ║")
-            print(
-                "║               ╚═╝  ╚═╝ ╚═════╝ ╚══════╝╚═╝  ╚═══╝   ╚═╝                     ║")
-            print(
-                "║                                                                              ║")
-            print("║                          🏦 金融分析智能体系统                              ║")
-            print(
-                "║                     Financial Analysis AI Agent System                      ║")
-            print(
-                "║                                                                              ║")
-            print(
-                "║    ┌─────────────────────────────────────────────────────────────────┐     ║")
-            print("║    │  📊 基本面分析  │  📈 技术分析  │  💰 估值分析  │  📰 新闻分析  │  🤖 智能总结  │    ║")
-            print(
-                "║    └─────────────────────────────────────────────────────────────────┘     ║")
-            print(
-                "║                                                                              ║")
-            print(
-                "╚══════════════════════════════════════════════════════════════════════════════╝")
-            print("\n🔹 本系统可以对A股公司进行全面分析，包括：")
-            print("  • 基本面分析 - 财务状况、盈利能力和行业地位")
-            print("  • 技术面分析 - 价格趋势、交易量和技术指标")
-            print("  • 估值分析 - 市盈率、市净率等估值水平")
-            print("  • 新闻分析 - 新闻情感分析和风险评估")
-            print("\n🔹 支持多种自然语言查询方式：")
-            print("  • 分析嘉友国际")
-            print("  • 帮我看看比亚迪这只股票怎么样")
-            print("  • 我想了解一下腾讯的投资价值")
-            print("  • 603871 这个股票值得买吗？")
-            print("  • 给我分析一下宁德时代的财务状况")
-            print("\n🔹 您可以用任何自然语言描述您的分析需求")
-            print("🔹 系统会自动识别股票名称和代码，并进行全面分析")
-            print("\n💡 提示：建议使用股票代码（如 000001、600036）以获得更准确的分析结果")
-            print("\n" + "─" * 78 + "\n")
+            # 显示ASCII艺术开屏图像和交互式界面（输出被重定向到文件或管道时跳过）
+            if sys.stdout.isatty():
+                sys.stdout.write(_BANNER)
+                sys.stdout.flush()
 
             # 获取用户输入
-            user_query = input("💬 请输入您的分析需求: ")
+            user_query = await _ainput("💬 请输入您的分析需求: ")
 
             # 确保输入不为空
             while not user_query.strip():
                 print(f"{ERROR_ICON} 输入不能为空，请重新输入！")
-                user_query = input("请输入您的分析需求: ")
+                user_query = await _ainput("请输入您的分析需求: ")
 
         # 记录用户查询到执行日志
         execution_logger.log_agent_start("main", {"user_query": user_query})
 
         # ============================================================================
-        # 3. 自然语言处理和股票信息提取
+        # 2. 自然语言处理和股票信息提取
         # ============================================================================
         
-        # 从查询中提取股票代码和公司名称
-        stock_code = None
-        company_name = None
-
-        # 定义更精确的提取模式
-        def extract_stock_info(query):
-            """精确提取股票代码和公司名称"""
-            stock_code = None
-            company_name = None
-            
-            # 模式1: 包含"请帮我分析一下"的复杂查询，如"请帮我分析一下嘉友国际(603871)这只股票的投资价值如何"
-            pattern1 = r'请帮我分析一下\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'
-            match1 = re.search(pattern1, query)
-            if match1:
-                company_name = match1.group(1).strip()
-                stock_code = match1.group(2)
-                return company_name, stock_code
-            
-            # 模式2: 包含"分析一下"的复杂查询，如"分析一下嘉友国际(603871)的财务状况"
-            pattern2 = r'分析一下\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'
-            match2 = re.search(pattern2, query)
-            if match2:
-                company_name = match2.group(1).strip()
-                stock_code = match2.group(2)
-                return company_name, stock_code
-            
-            # 模式3: 股票代码在括号内，如"分析嘉友国际(603871)"
-            pattern3 = r'分析\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'
-            match3 = re.search(pattern3, query)
-            if match3:
-                company_name = match3.group(1).strip()
-                stock_code = match3.group(2)
-                return company_name, stock_code
-            
-            # 模式4: 股票代码在括号内，如"分析(603871)嘉友国际"
-            pattern4 = r'分析\s*[（(](\d{5,6})[)）]\s*([^）)]+)'
-            match4 = re.search(pattern4, query)
-            if match4:
-                stock_code = match4.group(1)
-                company_name = match4.group(2).strip()
-                return company_name, stock_code
-            
-            # 模式5: 包含"帮我看看"的查询，如"帮我看看(000001)平安银行这只股票"
-            pattern5 = r'帮我看看\s*[（(](\d{5,6})[)）]\s*([^）)]+?)(?:\s*这只|\s*这个)?\s*股票'
-            match5 = re.search(pattern5, query)
-            if match5:
-                stock_code = match5.group(1)
-                company_name = match5.group(2).strip()
-                return company_name, stock_code
-            
-            # 模式6: 包含"我想了解一下"的查询，如"我想了解一下比亚迪(002594)的投资价值"
-            pattern6 = r'我想了解一下\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'
-            match6 = re.search(pattern6, query)
-            if match6:
-                company_name = match6.group(1).strip()
-                stock_code = match6.group(2)
-                return company_name, stock_code
-            
-            # 模式7: 包含"帮我看看"的复杂查询，如"帮我看看茅台(600519)这只股票值得投资吗"
-            pattern7 = r'帮我看看\s*([^（(]+?)\s*[（(](\d{5,6})[)）]'
-            match7 = re.search(pattern7, query)
-            if match7:
-                company_name = match7.group(1).strip()
-                stock_code = match7.group(2)
-                return company_name, stock_code
-            
-            # 模式8: 直接公司名+括号格式，如"平安银行(000001)值得买吗"
-            pattern8 = r'^([^（(]+?)\s*[（(](\d{5,6})[)）]'
-            match8 = re.search(pattern8, query)
-            if match8:
-                company_name = match8.group(1).strip()
-                stock_code = match8.group(2)
-                return company_name, stock_code
-            
-            # 模式9: 包含"分析一下"的查询，如"分析一下宁德时代的财务状况"
-            pattern9 = r'分析一下\s*([^0-9（）()\s]+?)(?:\s*的|\s|$)'
-            match9 = re.search(pattern9, query)
-            if match9:
-                company_name = match9.group(1).strip()
-            
-            # 模式10: 包含"分析"关键词，如"分析嘉友国际"
-            pattern10 = r'分析\s*([^0-9（）()\s]+)'
-            match10 = re.search(pattern10, query)
-            if match10 and not company_name:
-                company_name = match10.group(1).strip()
-            
-            # 模式11: 包含"股票"关键词的查询，如"嘉友国际这只股票怎么样"
-            pattern11 = r'([^0-9（）()\s]+)\s*(?:这只|这个|的)?\s*股票'
-            match11 = re.search(pattern11, query)
-            if match11 and not company_name:
-                company_name = match11.group(1).strip()
-            
-            # 模式12: 包含"投资价值"的查询，如"了解一下腾讯的投资价值"
-            pattern12 = r'了解一下\s*([^0-9（）()\s]+?)(?:\s*的|\s|$)'
-            match12 = re.search(pattern12, query)
-            if match12 and not company_name:
-                company_name = match12.group(1).strip()
-            
-            # 模式13: 包含"给我分析一下"的查询，如"给我分析一下宁德时代的财务状况"
-            pattern13 = r'给我分析一下\s*([^0-9（）()\s]+?)(?:\s*的|\s|$)'
-            match13 = re.search(pattern13, query)
-            if match13 and not company_name:
-                company_name = match13.group(1).strip()
-            
-            # 模式14: 包含"的"字的查询，如"嘉友国际的财务表现如何"
-            pattern14 = r'([^0-9（）()\s]+?)\s*的\s*(?:财务表现|盈利能力|现金流状况|资产负债情况|技术面|股价走势|技术指标|技术面表现|估值水平|市盈率|市净率|估值|投资风险|风险因素|风险评估|投资价值|股票|基本面情况|基本面|财务状况)'
-            match14 = re.search(pattern14, query)
-            if match14 and not company_name:
-                company_name = match14.group(1).strip()
-            
-            # 模式15: 包含"在...中"的查询（无"的"字），如"比亚迪在新能源汽车行业的表现"
-            pattern15 = r'([^0-9（）()\s]+?)\s*在\s*[^0-9（）()\s]*\s*中'
-            match15 = re.search(pattern15, query)
-            if match15 and not company_name:
-                company_name = match15.group(1).strip()
-            
-            # 模式16: 包含"在...中"的查询，如"嘉友国际在行业中的地位"
-            pattern16 = r'([^0-9（）()\s]+?)\s*在\s*[^0-9（）()\s]*\s*中\s*的'
-            match16 = re.search(pattern16, query)
-            if match16 and not company_name:
-                company_name = match16.group(1).strip()
-            
-            # 模式17: 包含"面临"的查询，如"比亚迪面临的主要风险"
-            pattern17 = r'([^0-9（）()\s]+?)\s*面临'
-            match17 = re.search(pattern17, query)
-            if match17 and not company_name:
-                company_name = match17.group(1).strip()
-            
-            # 模式18: 直接包含5-6位数字股票代码
-            pattern18 = r'\b(\d{5,6})\b'
-            match18 = re.search(pattern18, query)
-            if match18:
-                stock_code = match18.group(1)
-            
-            # 模式19: 包含"值得买"的查询，如"603871 这个股票值得买吗"
-            pattern19 = r'(\d{5,6})\s*(?:这个|这只)?\s*股票\s*值得买'
-            match19 = re.search(pattern19, query)
-            if match19 and not stock_code:
-                stock_code = match19.group(1)
-            
-            # 模式20: 包含"这个股票最近表现"的查询，如"603871这个股票最近表现怎么样，值得投资吗"
-            pattern20 = r'(\d{5,6})\s*这个\s*股票\s*最近表现'
-            match20 = re.search(pattern20, query)
-            if match20 and not stock_code:
-                stock_code = match20.group(1)
-            
-            # 清理公司名称（移除常见的无意义词汇）
-            if company_name:
-                # 移除常见的无意义词汇
-                stop_words = ['的', '这个', '这只', '一下', '看看', '了解', '分析', '帮我', '我想', '给我', '财务状况', '投资价值', '基本面情况', '这只股票', '这个股票']
-                for word in stop_words:
-                    company_name = company_name.replace(word, '').strip()
-                
-                # 如果公司名称太短（少于2个字符），可能是误匹配
-                if len(company_name) < 2:
-                    company_name = None
-            
-            return company_name, stock_code
-
-        # 执行提取
+        # 从查询中提取股票代码和公司名称（模块级函数，结果按查询缓存）
         company_name, stock_code = extract_stock_info(user_query)
 
         # 记录提取结果
         logger.info(f"从查询中提取 - 公司名称: {company_name}, 股票代码: {stock_code}")
 
         # ============================================================================
-        # 4. 时间信息处理
+        # 3. 时间信息处理
         # ============================================================================
         
-        # 获取当前时间信息
-        current_datetime = datetime.now()
-        current_date_cn = current_datetime.strftime("%Y年%m月%d日")
-        current_date_en = current_datetime.strftime("%Y-%m-%d")
-        current_weekday_cn = ["星期一", "星期二", "星期三", "星期四",
-                              "星期五", "星期六", "星期日"][current_datetime.weekday()]
-        current_time = current_datetime.strftime("%H:%M:%S")
-
-        # 格式化完整的时间信息
-        current_time_info = f"{current_date_cn} ({current_date_en}) {current_weekday_cn} {current_time}"
+        # 获取当前时间信息（本次查询的所有智能体共用）
+        time_ctx = build_time_ctx()
 
-        logger.info(f"当前时间: {current_time_info}")
+        logger.info(f"当前时间: {time_ctx['current_time_info']}")
 
         # ============================================================================
-        # 5. 准备初始状态数据
+        # 4. 准备初始状态数据
         # ============================================================================
         
         # 准备初始状态
-        initial_data = {
-            "query": user_query,
-            "current_date": current_date_en,
-            "current_date_cn": current_date_cn,
-            "current_time": current_time,
-            "current_weekday_cn": current_weekday_cn,
-            "current_time_info": current_time_info,
-            "analysis_timestamp": current_datetime.isoformat()
-        }
+        initial_data = {"query": user_query, **time_ctx}
         
         # 添加公司名称（如果提取到）
         if company_name:
@@ -444,13 +500,8 @@ async def main():
             
         # 添加股票代码（如果提取到），并添加交易所前缀
         if stock_code:
-            # 根据股票代码规则添加交易所前缀
-            if stock_code.startswith('6'):
-                initial_data["stock_code"] = f"sh.{stock_code}"  # 上海证券交易所
-            elif stock_code.startswith('0') or stock_code.startswith('3'):
-                initial_data["stock_code"] = f"sz.{stock_code}"  # 深圳证券交易所
-            else:
-                initial_data["stock_code"] = stock_code
+            # 根据股票代码首位查表添加交易所前缀，未知首位保持原样
+            initial_data["stock_code"] = _EXCH_PREFIX.get(stock_code[:1], "") + stock_code
 
         # 创建LangGraph工作流的初始状态
         initial_state = AgentState(
@@ -460,7 +511,7 @@ async def main():
         )
 
         # ============================================================================
-        # 6. 执行工作流
+        # 5. 执行工作流
         # ============================================================================
         
         # 显示分析开始信息
@@ -479,31 +530,36 @@ async def main():
         print(f"{WAIT_ICON} 正在执行新闻分析...")
         print(f"{WAIT_ICON} 这可能需要几分钟时间，请耐心等待...\n")
 
+        # 获取工作流（首次调用时导入智能体模块并构建、编译工作流）
+        app = get_app()
+
         # 调用工作流 - 这是阻塞调用，会等待所有智能体完成
         final_state = await app.ainvoke(initial_state)
         print(f"{SUCCESS_ICON} 分析完成！")
         logger.info("Workflow execution completed successfully")
 
         # ============================================================================
-        # 7. 结果处理和报告生成
+        # 6. 结果处理和报告生成
         # ============================================================================
         
         # 提取并打印最终报告
-        if final_state and final_state.get("data") and "final_report" in final_state["data"]:
+        final_data = final_state.get("data") if final_state else None
+        if final_data and "final_report" in final_data:
             print("\n--- 最终分析报告 (Final Analysis Report) ---\n")
-            # print(final_state["data"]["final_report"])
+            # print(final_data["final_report"])
 
             # 显示报告文件路径（如果可用）
-            if "report_path" in final_state["data"]:
+            report_path = final_data.get("report_path")
+            if report_path:
                 print(
-                    f"\n{SUCCESS_ICON} 报告已保存到: {final_state['data']['report_path']}")
+                    f"\n{SUCCESS_ICON} 报告已保存到: {report_path}")
                 logger.info(
-                    f"Report saved to: {final_state['data']['report_path']}")
+                    f"Report saved to: {report_path}")
 
                 # 记录最终报告到执行日志
                 execution_logger.log_final_report(
-                    final_state["data"]["final_report"],
-                    final_state["data"]["report_path"]
+                    final_data["final_report"],
+                    report_path
                 )
         else:
             print(f"\n{ERROR_ICON} 错误: 无法从工作流中检索最终报告。")
@@ -511,19 +567,21 @@ async def main():
                 "Could not retrieve the final report from the workflow")
             print("调试信息 - 最终状态内容:", final_state)
 
-        # 完成执行日志记录
+        # 完成执行日志记录（先等待 Agent在后台提交的日志写完）
+        await flush_background_logs()
         finalize_execution_logger(success=True)
         print(f"{SUCCESS_ICON} 执行日志已保存到: {execution_logger.execution_dir}")
 
     except Exception as e:
         # ============================================================================
-        # 8. 错误处理
+        # 7. 错误处理
         # ============================================================================
         
         print(f"\n{ERROR_ICON} 工作流执行期间发生错误: {e}")
         logger.error(f"Error during workflow execution: {e}", exc_info=True)
 
         # 记录错误并完成执行日志
+        await flush_background_logs()
         finalize_execution_logger(success=False, error=str(e))
         print(f"{ERROR_ICON} 错误日志已保存到: {get_execution_logger().execution_dir}")
 
@@ -533,5 +591,31 @@ async def main():
 # ============================================================================
 
 if __name__ == "__main__":
-    # 使用asyncio运行主函数
-    asyncio.run(main())
+    # 以下初始化只在作为程序入口运行时执行，被其他模块导入时不修改sys.path、不读取.env
+
+    # 添加项目根目录到Python路径，确保模块导入正常工作
+    sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+    # 加载环境变量（从.env文件）：只在程序入口加载一次，且必须在导入智能体模块之前，
+    # 部分模块在导入时读取配置（如 MCP_TOOLS_TTL、FINR1_BATCH_SIZE）
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    # 调试：记录关键环境变量以验证配置（DEBUG级别，只写入日志文件，不在控制台输出）
+    logger.debug("Environment Variables Loaded:")
+    logger.debug("  OPENAI_COMPATIBLE_MODEL: %s", os.getenv('OPENAI_COMPATIBLE_MODEL', 'Not Set'))
+    logger.debug("  OPENAI_COMPATIBLE_BASE_URL: %s", os.getenv('OPENAI_COMPATIBLE_BASE_URL', 'Not Set'))
+    logger.debug("  OPENAI_COMPATIBLE_API_KEY: %s",
+                 '*' * 20 if os.getenv('OPENAI_COMPATIBLE_API_KEY') else 'Not Set')
+
+    # 运行主函数：安装了uvloop（可选依赖，不支持Windows）时使用其事件循环，
+    # 降低MCP stdio传输和HTTP请求的调度开销；否则使用标准库asyncio事件循环
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
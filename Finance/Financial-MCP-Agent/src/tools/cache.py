@@ -0,0 +1,154 @@
+"""
+MCP工具结果缓存模块 - 将财务数据类工具的返回结果持久化到本地磁盘
+
+财务报表、分红、公司基本信息等数据最多按季度更新，没有必要每次运行都重新请求MCP服务器。
+缓存文件按 .cache/{tool_name}/{md5(args_json)}.json 存放，内容为 {"ts": ..., "data": ...}。
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from src.utils.logging_config import setup_logger, SUCCESS_ICON
+
+logger = setup_logger(__name__)
+
+# 默认缓存目录：项目根目录下的 .cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), ".cache")
+
+ONE_DAY = 24 * 60 * 60
+
+# 各工具的缓存有效期（秒），0 表示不缓存
+TOOL_CACHE_TTL = {
+    # 财务报表类数据按季度更新
+    "get_profit_data": 7 * ONE_DAY,
+    "get_operation_data": 7 * ONE_DAY,
+    "get_growth_data": 7 * ONE_DAY,
+    "get_balance_data": 7 * ONE_DAY,
+    "get_cash_flow_data": 7 * ONE_DAY,
+    "get_dupont_data": 7 * ONE_DAY,
+    "get_performance_express_report": 7 * ONE_DAY,
+    "get_forecast_report": 7 * ONE_DAY,
+    # 公司基本信息、行业分类和分红数据
+    "get_stock_basic_info": 7 * ONE_DAY,
+    "get_stock_industry": 7 * ONE_DAY,
+    "get_dividend_data": 7 * ONE_DAY,
+    # 最新交易日随日期变化，缓存可能跨日失效
+    "get_latest_trading_date": 0,
+    "get_market_analysis_timeframe": 0,
+}
+
+# 未在上表中列出的工具（如K线、复权因子、宏观数据）默认缓存一天
+DEFAULT_TTL = ONE_DAY
+
+# 名称中包含这些关键字的工具返回实时数据，永不缓存
+NO_CACHE_KEYWORDS = ("news", "realtime")
+
+
+def get_tool_ttl(tool_name: str) -> int:
+    """获取工具的缓存有效期（秒），返回0表示该工具不缓存"""
+    if any(keyword in tool_name for keyword in NO_CACHE_KEYWORDS):
+        return 0
+    return TOOL_CACHE_TTL.get(tool_name, DEFAULT_TTL)
+
+
+class FileCache:
+    """基于文件的TTL缓存，键为 (tool_name, args_hash)"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        初始化文件缓存
+
+        Args:
+            cache_dir: 缓存根目录
+        """
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, tool_name: str, args: Dict[str, Any]) -> str:
+        """根据工具名和参数计算缓存文件路径"""
+        args_json = json.dumps(args, sort_keys=True, ensure_ascii=False)
+        args_hash = hashlib.md5(args_json.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, tool_name, f"{args_hash}.json")
+
+    def get(self, tool_name: str, args: Dict[str, Any], ttl: int) -> Optional[Any]:
+        """
+        读取缓存
+
+        Returns:
+            未过期的缓存数据；缓存不存在、已过期或文件损坏时返回None
+        """
+        cache_path = self._cache_path(tool_name, args)
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                envelope = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - envelope.get("ts", 0) > ttl:
+            # 过期的缓存文件读取时直接删除，避免缓存目录无限增长
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+            return None
+        return envelope.get("data")
+
+    def set(self, tool_name: str, args: Dict[str, Any], data: Any):
+        """写入缓存，无法JSON序列化的数据直接跳过"""
+        try:
+            payload = json.dumps({"ts": time.time(), "data": data}, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skip caching result of '{tool_name}': {e}")
+            return
+
+        cache_path = self._cache_path(tool_name, args)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+
+
+def _is_error_result(result: Any) -> bool:
+    """MCP服务器以 "Error: ..." 字符串返回错误，这类结果不应被缓存"""
+    return isinstance(result, str) and result.startswith("Error")
+
+
+def wrap_tool_with_cache(tool: BaseTool, cache: FileCache) -> BaseTool:
+    """
+    为MCP工具包装一层文件缓存
+
+    命中未过期的缓存时直接返回缓存结果，否则调用原工具并写入缓存。
+    不需要缓存的工具原样返回。
+
+    Args:
+        tool: 原始MCP工具
+        cache: 文件缓存实例
+
+    Returns:
+        带缓存的工具（名称、描述和参数schema与原工具一致）
+    """
+    ttl = get_tool_ttl(tool.name)
+    if not ttl:
+        return tool
+
+    async def _cached_call(**kwargs):
+        cached = await asyncio.to_thread(cache.get, tool.name, kwargs, ttl)
+        if cached is not None:
+            logger.info(f"{SUCCESS_ICON} Cache hit for tool '{tool.name}'")
+            return cached
+
+        result = await tool.ainvoke(kwargs)
+        if not _is_error_result(result):
+            await asyncio.to_thread(cache.set, tool.name, kwargs, result)
+        return result
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        coroutine=_cached_call,
+    )
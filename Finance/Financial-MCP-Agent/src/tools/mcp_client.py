@@ -1,13 +1,31 @@
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from src.utils.logging_config import setup_logger, SUCCESS_ICON, ERROR_ICON, WAIT_ICON
 from src.tools.mcp_config import SERVER_CONFIGS
+from src.tools.cache import FileCache, wrap_tool_with_cache
 import asyncio  # 异步操作所需，如get_tools
 import json
+import os
+import time
 
 logger = setup_logger(__name__)
 
 _mcp_client_instance = None
 _mcp_tools = None
+_mcp_tools_loaded_at = 0.0
+# 预热任务的引用，避免任务在完成前被垃圾回收
+_prewarm_task = None
+# 保证并发的首次调用只初始化一次MCP客户端
+_mcp_tools_lock = asyncio.Lock()
+
+# 工具列表缓存有效期（秒），通过环境变量 MCP_TOOLS_TTL 设置；0（默认）表示进程内永久有效
+MCP_TOOLS_TTL = float(os.getenv("MCP_TOOLS_TTL", "0"))
+
+
+def _cached_tools_valid():
+    """缓存的工具列表存在且未超过有效期"""
+    if _mcp_tools is None:
+        return False
+    return MCP_TOOLS_TTL <= 0 or time.monotonic() - _mcp_tools_loaded_at < MCP_TOOLS_TTL
 
 
 def print_tool_details(tools):
@@ -33,17 +51,64 @@ async def get_mcp_tools():
     """
     使用定义的服务器配置初始化MultiServerMCPClient，
     并从a-share-mcp-v2服务器获取可用工具。
+    财务数据类工具会包装一层本地文件缓存（见 src/tools/cache.py）。
+
+    工具列表在进程内只加载一次，之后的调用直接返回缓存结果（设置 MCP_TOOLS_TTL 时过期后重新加载）；
+    多个Agent并发首次调用时由锁保证只进行一次握手。
 
     返回:
         list: 从MCP服务器加载的LangChain兼容工具列表。
               如果初始化或工具加载失败，则返回空列表。
     """
-    global _mcp_client_instance, _mcp_tools
-
-    if _mcp_tools is not None:
+    if _cached_tools_valid():
         logger.info(f"{SUCCESS_ICON} Returning cached MCP tools.")
         return _mcp_tools
 
+    async with _mcp_tools_lock:
+        # 等待锁期间其他调用可能已完成加载
+        if _cached_tools_valid():
+            logger.info(f"{SUCCESS_ICON} Returning cached MCP tools.")
+            return _mcp_tools
+        return await _load_mcp_tools()
+
+
+def prewarm_mcp_tools():
+    """
+    在后台开始加载工具列表（启动MCP服务器子进程并完成握手），不等待加载完成。
+
+    需要在事件循环中调用。之后 Agent调用 get_mcp_tools() 时直接复用已加载的工具，
+    若加载仍在进行则在锁上等待同一次加载，不会重复握手。
+
+    返回:
+        asyncio.Task: 加载任务；工具列表已缓存或已有预热任务在进行时返回None
+    """
+    global _prewarm_task
+    if _cached_tools_valid() or (_prewarm_task is not None and not _prewarm_task.done()):
+        return None
+    logger.info(f"{WAIT_ICON} Prewarming MCP tools in background...")
+    _prewarm_task = asyncio.create_task(get_mcp_tools())
+    return _prewarm_task
+
+
+async def refresh_mcp_tools():
+    """
+    丢弃缓存的工具列表并重新从MCP服务器加载，主要用于测试或服务器工具发生变化时。
+
+    返回:
+        list: 重新加载的工具列表
+    """
+    global _mcp_client_instance, _mcp_tools
+    async with _mcp_tools_lock:
+        _mcp_client_instance = None
+        _mcp_tools = None
+        return await _load_mcp_tools()
+
+
+async def _load_mcp_tools():
+    """创建MCP客户端并加载工具，调用方需持有 _mcp_tools_lock"""
+    global _mcp_client_instance, _mcp_tools, _mcp_tools_loaded_at
+    _mcp_tools_loaded_at = time.monotonic()
+
     logger.info(
         f"{WAIT_ICON} Initializing MultiServerMCPClient with config: {SERVER_CONFIGS}")
     try:
@@ -60,7 +125,9 @@ async def get_mcp_tools():
             _mcp_tools = []  # Cache empty list on failure to load
             return []
 
-        _mcp_tools = loaded_tools
+        # 为工具包装本地文件缓存，避免重复请求按季度更新的财务数据
+        tool_cache = FileCache()
+        _mcp_tools = [wrap_tool_with_cache(tool, tool_cache) for tool in loaded_tools]
         logger.info(
             f"{SUCCESS_ICON} Successfully loaded {len(_mcp_tools)} tools from 'a_share_mcp_v2'.")
 
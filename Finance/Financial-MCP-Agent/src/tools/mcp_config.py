@@ -1,17 +1,39 @@
 """
 MCP服务器配置模块 - 包含连接A股MCP服务器的配置信息
 """
+import shutil
+from datetime import timedelta
+from pathlib import Path
+from types import MappingProxyType
 
-SERVER_CONFIGS = {
-    "a_share_mcp_v2": {  
-        "command": "uv", 
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# 单次MCP请求（如一次工具调用）的最长等待时间，超时后该工具调用返回错误而不是无限等待
+MCP_TOOL_TIMEOUT = timedelta(seconds=60)
+
+# MCP服务器项目路径：与本项目同在 Finance 目录下，模块加载时解析一次
+MCP_SERVER_DIR = str(Path(__file__).resolve().parents[3] / "a-share-mcp-is-just-i-need")
+
+# uv可执行文件的完整路径，模块加载时查找一次；找不到时尽早提示，而不是等到启动子进程失败
+UV_COMMAND = shutil.which("uv")
+if UV_COMMAND is None:
+    logger.warning("'uv' executable not found on PATH, the MCP server subprocess will fail to start.")
+    UV_COMMAND = "uv"
+
+# 只读的服务器配置，导入后不会再被修改
+SERVER_CONFIGS = MappingProxyType({
+    "a_share_mcp_v2": MappingProxyType({
+        "command": UV_COMMAND,
         "args": [
-            "run",  
+            "run",
             "--directory",
-            r"E:\coding\居丽叶简历项目3：股票投资顾问Agent\Finance\a-share-mcp-is-just-i-need",  # MCP服务器项目路径（Windows）
-            "python",  #
+            MCP_SERVER_DIR,  # MCP服务器项目路径
+            "python",
             "mcp_server.py"  # MCP服务器脚本
         ],
         "transport": "stdio",
-    }
-}
\ No newline at end of file
+        "session_kwargs": {"read_timeout_seconds": MCP_TOOL_TIMEOUT},
+    })
+})
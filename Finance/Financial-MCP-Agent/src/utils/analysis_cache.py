@@ -0,0 +1,77 @@
+"""
+分析结果缓存模块 - 缓存 Agent对同一股票、同一分析日期生成的分析文本
+
+同一股票在同一天内被重复分析（重跑、重试、看板刷新）时直接返回上一次的结果，
+跳过整个LLM + MCP工具调用流程。
+缓存文件按 .cache/analysis/{namespace}/{key}.json 存放，内容为 {"ts": ..., "ttl": ..., "data": ...}。
+"""
+import os
+import json
+import time
+import hashlib
+from typing import Optional
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# 默认缓存目录：项目根目录下的 .cache/analysis
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), ".cache", "analysis")
+
+ONE_DAY = 24 * 60 * 60
+
+
+def make_cache_key(stock_code: str, current_date: str, prompt_version: str) -> str:
+    """根据股票代码、分析日期和提示词版本计算缓存键，提示词变化时通过版本号使旧缓存失效"""
+    return hashlib.md5(f"{stock_code}|{current_date}|{prompt_version}".encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """基于文件的分析结果缓存，每个 Agent使用独立的命名空间"""
+
+    def __init__(self, namespace: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        初始化分析结果缓存
+
+        Args:
+            namespace: 命名空间，通常为 Agent名称
+            cache_dir: 缓存根目录
+        """
+        self.cache_dir = os.path.join(cache_dir, namespace)
+
+    def _cache_path(self, key: str) -> str:
+        """根据缓存键计算缓存文件路径"""
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存
+
+        Returns:
+            未过期的分析文本；缓存不存在、已过期或文件损坏时返回None
+        """
+        cache_path = self._cache_path(key)
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                envelope = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - envelope.get("ts", 0) > envelope.get("ttl", ONE_DAY):
+            # 过期的缓存文件读取时直接删除，避免缓存目录无限增长
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+            return None
+        return envelope.get("data")
+
+    def set(self, key: str, value: str, ttl: int = ONE_DAY):
+        """写入缓存，写入失败只记录警告，不影响分析流程"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._cache_path(key), "w", encoding="utf-8") as f:
+                json.dump({"ts": time.time(), "ttl": ttl, "data": value}, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Failed to write analysis cache '{key}': {e}")
@@ -3,36 +3,141 @@
 记录所有agent与LLM的交互信息，包括输入、输出、执行时间等
 """
 import os
+import sys
 import json
+import io
 import time
+import queue
+import shutil
+import asyncio
+import tarfile
+import threading
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
-import uuid
+
+from src.utils.logging_config import setup_logger
+from src.utils.llm_config import llm_cfg
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时使用标准库json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖，未安装时LLM交互日志只能保存为JSON
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖，未安装时不压缩归档旧的LLM交互日志
+    zstandard = None
+
+logger = setup_logger(__name__)
+
+# 开启归档时，最近几次执行的LLM交互日志保持未压缩，方便直接查看；更早的执行打包为 llm_interactions.tar.zst
+KEEP_UNCOMPRESSED_EXECUTIONS = 5
+INTERACTIONS_ARCHIVE = "llm_interactions.tar.zst"
+
+# LLM交互日志的文件格式及对应的扩展名
+INTERACTION_FORMATS = {"json": ".json", "msgpack": ".mpack"}
+
+
+def _dump_bytes(data: Any, indent: bool = False) -> bytes:
+    """序列化为UTF-8编码的JSON，优先使用orjson（直接输出UTF-8字节，长文本序列化更快），中文不转义"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option)
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+def _now() -> Tuple[float, str]:
+    """只读取一次时钟，同时返回时间戳和精确到毫秒的ISO格式时间"""
+    t = time.time()
+    return t, datetime.fromtimestamp(t).isoformat(timespec="milliseconds")
+
+
+# Agent开始/完成事件统一追加到同一个JSONL文件
+AGENT_EVENTS_FILE = "agents/events.jsonl"
+
+
+def fold_agent_events(events_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    将 agents/events.jsonl 中的事件按 Agent名称归并为每个 Agent的执行记录
+
+    start 事件开始一条新记录，complete 事件把完成信息合并到该记录中，
+    结果与按 Agent单独保存的执行记录格式一致（按首次出现的顺序排列）。
+    """
+    agents: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(events_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # 写入中断导致的残缺行
+                event_type = event.pop("event", None)
+                name = event.get("agent_name")
+                if event_type == "start" or name not in agents:
+                    agents[name] = event
+                else:
+                    agents[name].update(event)
+    except OSError:
+        pass
+    return agents
 
 
 class ExecutionLogger:
     """执行日志记录器"""
 
-    def __init__(self, base_log_dir: str = "logs"):
+    def __init__(self, base_log_dir: str = "logs", interaction_format: str = "json",
+                 archive_interactions: bool = False):
         """
         初始化执行日志记录器
 
         Args:
             base_log_dir: 基础日志目录
+            interaction_format: LLM交互日志的格式，"json"（默认）或 "msgpack"（体积更小、写入更快，需要安装msgpack）
+            archive_interactions: 完成执行时是否将移出最近 KEEP_UNCOMPRESSED_EXECUTIONS 次的那次执行的
+                LLM交互日志打包压缩（默认关闭，需要安装zstandard）
         """
+        if interaction_format not in INTERACTION_FORMATS:
+            raise ValueError(f"Unsupported interaction log format: {interaction_format}")
+        if interaction_format == "msgpack" and msgpack is None:
+            logger.warning("msgpack is not installed, LLM interaction logs will be saved as JSON.")
+            interaction_format = "json"
+        self.interaction_format = interaction_format
+
+        if archive_interactions and zstandard is None:
+            logger.warning("zstandard is not installed, LLM interaction logs will not be archived.")
+            archive_interactions = False
+        self.archive_interactions = archive_interactions
+
         self.base_log_dir = Path(base_log_dir)
         self.execution_id = self._generate_execution_id()
         self.execution_dir = self._create_execution_dir()
         self.start_time = time.time()
 
+        # 已打开的JSONL追加文件句柄（按相对文件名缓存），在完成执行日志记录时统一关闭
+        self._jsonl_handles: Dict[str, io.BufferedWriter] = {}
+        # 日志调用可能来自后台写入线程和同步 Agent所在的工作线程
+        self._jsonl_lock = threading.Lock()
+
+        # LLM交互记录由单个后台线程序列化并写入，首次记录时启动
+        self._interaction_queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._interaction_writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
         # 记录执行开始信息
         self._log_execution_start()
 
     def _generate_execution_id(self) -> str:
         """生成唯一的执行ID"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = os.urandom(4).hex()
         return f"{timestamp}_{unique_id}"
 
     def _create_execution_dir(self) -> Path:
@@ -40,27 +145,36 @@ class ExecutionLogger:
         execution_dir = self.base_log_dir / self.execution_id
         execution_dir.mkdir(parents=True, exist_ok=True)
 
-        # 创建子目录
-        (execution_dir / "agents").mkdir(exist_ok=True)
-        (execution_dir / "llm_interactions").mkdir(exist_ok=True)
-        (execution_dir / "tools").mkdir(exist_ok=True)
-        (execution_dir / "reports").mkdir(exist_ok=True)
+        # 创建子目录，并记录已存在的目录，写日志时不再逐次调用mkdir
+        self._ensured_dirs = {execution_dir}
+        for sub_dir in ("agents", "llm_interactions", "tools", "reports"):
+            (execution_dir / sub_dir).mkdir(exist_ok=True)
+            self._ensured_dirs.add(execution_dir / sub_dir)
 
         return execution_dir
 
+    def _ensure_parent_dir(self, file_path: Path):
+        """确保文件所在目录存在，只对尚未创建过的目录调用mkdir"""
+        parent = file_path.parent
+        if parent not in self._ensured_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._ensured_dirs.add(parent)
+
     def _log_execution_start(self):
         """记录执行开始信息"""
+        # 环境变量通过 llm_cfg() 只读取一次，与各 Agent使用同一份配置
+        cfg = llm_cfg()
         start_info = {
             "execution_id": self.execution_id,
-            "start_time": datetime.now().isoformat(),
+            "start_time": datetime.fromtimestamp(self.start_time).isoformat(timespec="milliseconds"),
             "start_timestamp": self.start_time,
             "environment": {
-                "python_version": os.sys.version,
+                "python_version": "%d.%d.%d" % sys.version_info[:3],
                 "working_directory": os.getcwd(),
                 "environment_variables": {
-                    "OPENAI_COMPATIBLE_MODEL": os.getenv("OPENAI_COMPATIBLE_MODEL", "Not Set"),
-                    "OPENAI_COMPATIBLE_BASE_URL": os.getenv("OPENAI_COMPATIBLE_BASE_URL", "Not Set"),
-                    "OPENAI_COMPATIBLE_API_KEY": "***" if os.getenv("OPENAI_COMPATIBLE_API_KEY") else "Not Set"
+                    "OPENAI_COMPATIBLE_MODEL": cfg.model or "Not Set",
+                    "OPENAI_COMPATIBLE_BASE_URL": cfg.base_url or "Not Set",
+                    "OPENAI_COMPATIBLE_API_KEY": "***" if cfg.api_key else "Not Set"
                 }
             }
         }
@@ -69,38 +183,35 @@ class ExecutionLogger:
 
     def log_agent_start(self, agent_name: str, input_data: Dict[str, Any]):
         """记录agent开始执行"""
+        timestamp, iso_time = _now()
         agent_log = {
             "agent_name": agent_name,
-            "start_time": datetime.now().isoformat(),
-            "start_timestamp": time.time(),
+            "start_time": iso_time,
+            "start_timestamp": timestamp,
             "input_data": input_data,
             "status": "started"
         }
 
-        agent_file = f"agents/{agent_name}_execution.json"
-        self._save_json(agent_log, agent_file)
+        self._append_jsonl({"event": "start", **agent_log}, AGENT_EVENTS_FILE)
 
         return agent_log
 
     def log_agent_complete(self, agent_name: str, output_data: Dict[str, Any],
                            execution_time: float, success: bool = True, error: str = None):
-        """记录agent执行完成"""
-        # 读取现有的agent日志
-        agent_file = f"agents/{agent_name}_execution.json"
-        agent_log = self._load_json(agent_file) or {}
-
-        # 更新完成信息
-        agent_log.update({
-            "end_time": datetime.now().isoformat(),
-            "end_timestamp": time.time(),
+        """记录agent执行完成，只追加完成事件，开始信息在读取时按 Agent名称合并"""
+        timestamp, iso_time = _now()
+        agent_log = {
+            "agent_name": agent_name,
+            "end_time": iso_time,
+            "end_timestamp": timestamp,
             "execution_time_seconds": execution_time,
             "output_data": output_data,
             "success": success,
             "error": error,
             "status": "completed" if success else "failed"
-        })
+        }
 
-        self._save_json(agent_log, agent_file)
+        self._append_jsonl({"event": "complete", **agent_log}, AGENT_EVENTS_FILE)
         return agent_log
 
     def log_llm_interaction(self, agent_name: str, interaction_type: str,
@@ -108,18 +219,25 @@ class ExecutionLogger:
                             model_config: Dict[str, Any], execution_time: float,
                             token_usage: Optional[Dict] = None):
         """记录LLM交互详情"""
-        interaction_id = str(uuid.uuid4())[:8]
+        # 8位十六进制随机ID，直接由随机字节生成，不构造UUID对象
+        interaction_id = os.urandom(4).hex()
+        # 消息内容通常已经是字符串，直接取长度，只有其他类型（如多段内容列表）才转换为字符串
+        total_input_length = 0
+        for msg in input_messages:
+            content = msg.get("content", "")
+            total_input_length += len(content) if isinstance(content, str) else len(str(content))
+
         interaction_log = {
             "interaction_id": interaction_id,
             "agent_name": agent_name,
             # "react_agent", "summary", etc.
             "interaction_type": interaction_type,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now()[1],
             "model_config": model_config,
             "input": {
                 "messages": input_messages,
                 "message_count": len(input_messages),
-                "total_input_length": sum(len(str(msg.get("content", ""))) for msg in input_messages)
+                "total_input_length": total_input_length
             },
             "output": {
                 "content": output_content,
@@ -131,28 +249,70 @@ class ExecutionLogger:
             }
         }
 
-        # 保存到LLM交互目录
-        interaction_file = f"llm_interactions/{agent_name}_{interaction_type}_{interaction_id}.json"
-        self._save_json(interaction_log, interaction_file)
-
-        # 同时保存输入输出的纯文本版本，方便查看
-        self._save_text(
-            f"=== INPUT MESSAGES ===\n{json.dumps(input_messages, ensure_ascii=False, indent=2)}\n\n"
-            f"=== OUTPUT CONTENT ===\n{output_content}",
-            f"llm_interactions/{agent_name}_{interaction_type}_{interaction_id}.txt"
-        )
+        # 保存到LLM交互目录，序列化与写入交给后台写入线程
+        # 纯文本版本不再随每次交互写入，需要时通过 LogViewer.render_interaction_text 生成
+        interaction_file = (f"llm_interactions/{agent_name}_{interaction_type}_{interaction_id}"
+                            f"{INTERACTION_FORMATS[self.interaction_format]}")
+        self._ensure_interaction_writer()
+        self._interaction_queue.put((interaction_log, interaction_file))
 
         return interaction_log
 
+    def _ensure_interaction_writer(self):
+        """按需启动LLM交互记录的后台写入线程"""
+        with self._writer_lock:
+            if self._interaction_writer is None:
+                self._interaction_writer = threading.Thread(
+                    target=self._drain_interactions, name="llm-log-writer", daemon=True)
+                self._interaction_writer.start()
+
+    def _drain_interactions(self):
+        """后台写入线程：每次取出队列中已有的记录（最多64条）连续写入，收到None时退出"""
+        while True:
+            batch = [self._interaction_queue.get()]
+            while len(batch) < 64:
+                try:
+                    batch.append(self._interaction_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if item is None:
+                    return
+                interaction_log, interaction_file = item
+                try:
+                    if self.interaction_format == "msgpack":
+                        self._save_msgpack(interaction_log, interaction_file)
+                    else:
+                        self._save_json(interaction_log, interaction_file)
+                except Exception as e:
+                    logger.warning(f"Failed to write LLM interaction log '{interaction_file}': {e}")
+
+    def _stop_interaction_writer(self):
+        """等待后台写入线程写完队列中的全部记录后退出"""
+        with self._writer_lock:
+            writer, self._interaction_writer = self._interaction_writer, None
+        if writer is not None:
+            self._interaction_queue.put(None)
+            writer.join()
+
     def log_tool_usage(self, agent_name: str, tool_name: str, tool_input: Dict,
                        tool_output: Any, execution_time: float, success: bool = True, error: str = None):
         """记录工具使用情况"""
+        # 输出只保留前1000个字符，只转换一次字符串；DataFrame只渲染前10行，不生成整个表格的字符串
+        if hasattr(tool_output, "head") and hasattr(tool_output, "to_string"):
+            output = tool_output.head(10).to_string()
+        else:
+            output = str(tool_output)
+        if len(output) > 1000:
+            output = output[:1000] + "..."
+
         tool_log = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now()[1],
             "agent_name": agent_name,
             "tool_name": tool_name,
             "input": tool_input,
-            "output": str(tool_output)[:1000] + "..." if len(str(tool_output)) > 1000 else str(tool_output),
+            "output": output,
             "execution_time_seconds": execution_time,
             "success": success,
             "error": error
@@ -167,7 +327,7 @@ class ExecutionLogger:
     def log_final_report(self, report_content: str, report_path: str):
         """记录最终生成的报告"""
         report_log = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now()[1],
             "report_path": report_path,
             "report_length": len(report_content),
             "report_preview": report_content
@@ -183,15 +343,19 @@ class ExecutionLogger:
 
     def finalize_execution(self, success: bool = True, error: str = None):
         """完成执行日志记录"""
-        end_time = time.time()
+        end_time, end_iso_time = _now()
         total_execution_time = end_time - self.start_time
 
+        # 先把尚未写入的LLM交互记录和缓冲中的JSONL记录写入磁盘，后面的执行摘要需要读取这些文件
+        self._stop_interaction_writer()
+        self.close()
+
         # 读取执行信息
         execution_info = self._load_json("execution_info.json") or {}
 
         # 更新完成信息
         execution_info.update({
-            "end_time": datetime.now().isoformat(),
+            "end_time": end_iso_time,
             "end_timestamp": end_time,
             "total_execution_time_seconds": total_execution_time,
             "success": success,
@@ -208,8 +372,34 @@ class ExecutionLogger:
         # 生成可读的摘要报告
         self._generate_readable_summary(execution_info)
 
+        # 压缩归档刚移出保留窗口的那次执行的LLM交互日志
+        if self.archive_interactions:
+            self._archive_old_interactions()
+
         return execution_info
 
+    def _archive_old_interactions(self):
+        """
+        将刚移出最近 KEEP_UNCOMPRESSED_EXECUTIONS 次的那一次执行的 llm_interactions 目录打包压缩
+
+        每次完成执行只处理一个目录，耗时不随历史日志数量增长；开启归档之前的更早执行保持不变。
+        """
+        try:
+            with os.scandir(self.base_log_dir) as it:
+                # 执行ID以时间开头，按名称倒序即为从新到旧
+                execution_dirs = sorted((e.path for e in it if e.is_dir(follow_symlinks=False)), reverse=True)
+        except OSError as e:
+            logger.warning(f"Failed to scan log directory for archiving: {e}")
+            return
+
+        if len(execution_dirs) <= KEEP_UNCOMPRESSED_EXECUTIONS:
+            return
+        exec_path = Path(execution_dirs[KEEP_UNCOMPRESSED_EXECUTIONS])
+        llm_dir = exec_path / "llm_interactions"
+        # 已有归档时不再重复打包（归档后通过日志查看器生成的纯文本文件会保留在目录中）
+        if llm_dir.is_dir() and not (exec_path / INTERACTIONS_ARCHIVE).exists():
+            _archive_subdir(llm_dir)
+
     def _generate_execution_summary(self) -> Dict[str, Any]:
         """生成执行摘要"""
         summary = {
@@ -220,33 +410,32 @@ class ExecutionLogger:
         }
 
         # 统计agent执行情况
-        agents_dir = self.execution_dir / "agents"
-        if agents_dir.exists():
-            for agent_file in agents_dir.glob("*_execution.json"):
-                agent_data = self._load_json(f"agents/{agent_file.name}")
-                if agent_data:
-                    summary["agents_executed"].append({
-                        "name": agent_data.get("agent_name"),
-                        "success": agent_data.get("success", False),
-                        "execution_time": agent_data.get("execution_time_seconds", 0)
-                    })
+        for agent_data in fold_agent_events(self.execution_dir / AGENT_EVENTS_FILE).values():
+            summary["agents_executed"].append({
+                "name": agent_data.get("agent_name"),
+                "success": agent_data.get("success", False),
+                "execution_time": agent_data.get("execution_time_seconds", 0)
+            })
 
         # 统计LLM交互次数
         llm_dir = self.execution_dir / "llm_interactions"
         if llm_dir.exists():
-            summary["llm_interactions_count"] = len(
-                list(llm_dir.glob("*.json")))
+            summary["llm_interactions_count"] = sum(
+                1 for f in llm_dir.iterdir() if f.suffix in (".json", ".mpack"))
 
-        # 统计工具使用次数
+        # 统计工具使用次数（按块统计换行符，不解码、不把整个文件读入列表）
         tools_dir = self.execution_dir / "tools"
         if tools_dir.exists():
             for tool_file in tools_dir.glob("*.jsonl"):
-                with open(tool_file, 'r', encoding='utf-8') as f:
-                    summary["tools_used_count"] += len(f.readlines())
+                with open(tool_file, 'rb') as f:
+                    while chunk := f.read(1 << 16):
+                        summary["tools_used_count"] += chunk.count(b'\n')
 
-        # 统计创建的文件数量
-        summary["total_files_created"] = len(
-            list(self.execution_dir.rglob("*")))
+        # 统计创建的文件数量（与 rglob("*") 一致，包含子目录；os.walk 基于scandir，不为每个条目构造Path）
+        total_files = 0
+        for _, dir_names, file_names in os.walk(self.execution_dir):
+            total_files += len(dir_names) + len(file_names)
+        summary["total_files_created"] = total_files
 
         return summary
 
@@ -289,10 +478,16 @@ class ExecutionLogger:
     def _save_json(self, data: Dict[str, Any], filename: str):
         """保存JSON数据"""
         file_path = self.execution_dir / filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._ensure_parent_dir(file_path)
 
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 交互记录中包含完整的提示词和分析结果，经 _dump_bytes 序列化（优先orjson）后直接写入字节
+        file_path.write_bytes(_dump_bytes(data, indent=True))
+
+    def _save_msgpack(self, data: Dict[str, Any], filename: str):
+        """保存MessagePack数据"""
+        file_path = self.execution_dir / filename
+        self._ensure_parent_dir(file_path)
+        file_path.write_bytes(msgpack.packb(data, use_bin_type=True))
 
     def _load_json(self, filename: str) -> Optional[Dict[str, Any]]:
         """加载JSON数据"""
@@ -307,22 +502,57 @@ class ExecutionLogger:
             return None
 
     def _append_jsonl(self, data: Dict[str, Any], filename: str):
-        """追加JSONL数据"""
-        file_path = self.execution_dir / filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(file_path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(data, ensure_ascii=False) + '\n')
+        """追加JSONL数据，文件句柄保持打开，由缓冲区合并多次小写入"""
+        line = _dump_bytes(data) + b'\n'
+        with self._jsonl_lock:
+            f = self._jsonl_handles.get(filename)
+            if f is None:
+                file_path = self.execution_dir / filename
+                self._ensure_parent_dir(file_path)
+                f = open(file_path, 'ab', buffering=65536)
+                self._jsonl_handles[filename] = f
+            f.write(line)
+
+    def close(self):
+        """刷新并关闭所有已打开的JSONL文件句柄，之后再追加时会重新打开"""
+        with self._jsonl_lock:
+            handles, self._jsonl_handles = self._jsonl_handles, {}
+        for f in handles.values():
+            try:
+                f.close()
+            except OSError as e:
+                logger.warning(f"Failed to close log file '{f.name}': {e}")
 
     def _save_text(self, content: str, filename: str):
         """保存文本内容"""
         file_path = self.execution_dir / filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._ensure_parent_dir(file_path)
 
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
 
 
+def _archive_subdir(sub_dir: Path):
+    """
+    将目录打包为同级的 <目录名>.tar.zst（zstd level 3）并删除原目录
+
+    先写入临时文件再重命名，中途失败时原目录保持不变。
+    """
+    archive_path = sub_dir.parent / f"{sub_dir.name}.tar.zst"
+    tmp_path = archive_path.with_name(archive_path.name + ".tmp")
+    try:
+        with open(tmp_path, 'wb') as raw:
+            with zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False) as compressed:
+                with tarfile.open(fileobj=compressed, mode='w|') as tar:
+                    tar.add(sub_dir, arcname=sub_dir.name)
+        os.replace(tmp_path, archive_path)
+    except Exception as e:
+        logger.warning(f"Failed to archive '{sub_dir}': {e}")
+        tmp_path.unlink(missing_ok=True)
+        return
+    shutil.rmtree(sub_dir, ignore_errors=True)
+
+
 # 全局执行日志记录器实例
 _execution_logger: Optional[ExecutionLogger] = None
 
@@ -335,16 +565,83 @@ def get_execution_logger() -> ExecutionLogger:
     return _execution_logger
 
 
-def initialize_execution_logger(base_log_dir: str = "logs") -> ExecutionLogger:
+def initialize_execution_logger(base_log_dir: str = "logs", interaction_format: str = "json",
+                                archive_interactions: bool = False) -> ExecutionLogger:
     """初始化执行日志记录器"""
     global _execution_logger
-    _execution_logger = ExecutionLogger(base_log_dir)
+    _execution_logger = ExecutionLogger(base_log_dir, interaction_format, archive_interactions)
     return _execution_logger
 
 
+class BackgroundLogWriter:
+    """
+    后台日志写入器
+
+    在事件循环中提交的日志调用放入队列，由单个后台任务按提交顺序在线程中执行，
+    避免大段分析文本的JSON序列化和文件写入阻塞事件循环。
+    顺序执行保证同一 Agent的 start/complete 日志不会乱序。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def submit(self, func, *args, **kwargs):
+        """提交一次日志调用；不在事件循环中时直接同步执行"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            func(*args, **kwargs)
+            return
+
+        # 每个事件循环使用独立的队列和后台任务（如多次调用asyncio.run）
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        self._queue.put_nowait((func, args, kwargs))
+
+    async def _run(self):
+        """按顺序执行队列中的日志调用"""
+        while True:
+            func, args, kwargs = await self._queue.get()
+            try:
+                await asyncio.to_thread(func, *args, **kwargs)
+            except Exception as e:
+                logger.warning(f"Background log write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def flush(self):
+        """等待当前事件循环中已提交的日志全部写入"""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+
+_background_writer = BackgroundLogWriter()
+
+
+def log_in_background(func, *args, **kwargs):
+    """
+    在后台执行日志调用，例如 log_in_background(execution_logger.log_agent_start, name, data)
+
+    传入的可变对象会在稍后被序列化，调用方应传入不会再被修改的数据（必要时传入副本）。
+    """
+    _background_writer.submit(func, *args, **kwargs)
+
+
+async def flush_background_logs():
+    """等待后台日志全部写入，应在完成执行日志记录之前调用"""
+    await _background_writer.flush()
+
+
 def finalize_execution_logger(success: bool = True, error: str = None):
     """完成执行日志记录"""
     global _execution_logger
     if _execution_logger:
-        _execution_logger.finalize_execution(success, error)
-        _execution_logger = None
+        try:
+            _execution_logger.finalize_execution(success, error)
+        finally:
+            _execution_logger.close()
+            _execution_logger = None
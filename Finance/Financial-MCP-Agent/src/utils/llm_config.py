@@ -0,0 +1,69 @@
+"""
+LLM配置模块 - 一次性读取OpenAI兼容接口的环境变量
+
+各 Agent不再在每次调用时分别读取 OPENAI_COMPATIBLE_* 环境变量，统一通过 llm_cfg() 获取同一个只读配置对象。
+.env 文件由程序入口加载，首次调用 llm_cfg() 之后环境变量的变化不会再生效。
+各 Agent通过 get_chat_llm() 共享按配置和生成参数缓存的 ChatOpenAI 实例。
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+from src.utils.logging_config import setup_logger, WAIT_ICON
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = setup_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class LLMCfg:
+    """OpenAI兼容接口的连接配置"""
+    api_key: Optional[str]
+    base_url: Optional[str]
+    model: Optional[str]
+
+    @property
+    def is_complete(self) -> bool:
+        """三个必要的配置项是否都已设置"""
+        return bool(self.api_key and self.base_url and self.model)
+
+
+@lru_cache(maxsize=1)
+def llm_cfg() -> LLMCfg:
+    """读取并缓存 OPENAI_COMPATIBLE_API_KEY / OPENAI_COMPATIBLE_BASE_URL / OPENAI_COMPATIBLE_MODEL"""
+    return LLMCfg(
+        api_key=os.getenv("OPENAI_COMPATIBLE_API_KEY"),
+        base_url=os.getenv("OPENAI_COMPATIBLE_BASE_URL"),
+        model=os.getenv("OPENAI_COMPATIBLE_MODEL"),
+    )
+
+
+def get_chat_llm(temperature: float, max_tokens: int) -> ChatOpenAI:
+    """
+    获取当前配置下的ChatOpenAI实例，按 (配置, temperature, max_tokens) 缓存
+
+    调用方需先通过 llm_cfg().is_complete 确认配置完整。
+    """
+    return _cached_chat_llm(llm_cfg(), temperature, max_tokens)
+
+
+@lru_cache(maxsize=8)
+def _cached_chat_llm(cfg: LLMCfg, temperature: float, max_tokens: int) -> ChatOpenAI:
+    """创建ChatOpenAI实例；同一实例在各次调用间复用底层HTTP连接池"""
+    # OpenAI客户端较重，首次创建模型时才导入
+    from langchain_openai import ChatOpenAI
+
+    logger.info(f"{WAIT_ICON} Creating ChatOpenAI with model {cfg.model} "
+                f"(temperature={temperature}, max_tokens={max_tokens})")
+    return ChatOpenAI(
+        model=cfg.model,
+        api_key=cfg.api_key,
+        base_url=cfg.base_url,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
@@ -4,11 +4,24 @@
 """
 import os
 import json
+import tarfile
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 import argparse
 
+from src.utils.execution_logger import AGENT_EVENTS_FILE, INTERACTIONS_ARCHIVE, fold_agent_events
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖，未安装时无法读取 .mpack 格式的LLM交互日志
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖，未安装时无法读取已压缩归档的LLM交互日志
+    zstandard = None
+
 
 class LogViewer:
     """执行日志查看器"""
@@ -37,13 +50,15 @@ class LogViewer:
         if not self.base_log_dir.exists():
             return executions
 
-        # 获取所有执行目录
-        execution_dirs = [d for d in self.base_log_dir.iterdir() if d.is_dir()]
+        # 获取所有执行目录（os.scandir 的目录项自带文件类型，判断是否为目录时无需额外的isdir调用）
+        with os.scandir(self.base_log_dir) as it:
+            entries = [(e.path, e.stat().st_ctime) for e in it if e.is_dir(follow_symlinks=False)]
 
         # 按创建时间排序
-        execution_dirs.sort(key=lambda x: x.stat().st_ctime, reverse=True)
+        entries.sort(key=lambda x: x[1], reverse=True)
 
-        for exec_dir in execution_dirs[:limit]:
+        for exec_path, _ in entries[:limit]:
+            exec_dir = Path(exec_path)
             execution_info_file = exec_dir / "execution_info.json"
             if execution_info_file.exists():
                 try:
@@ -84,18 +99,17 @@ class LogViewer:
         agents_dir = execution_dir / "agents"
         if agents_dir.exists():
             details["agents"] = {}
+            # 旧版本的日志按 Agent分别保存为 *_execution.json
             for agent_file in agents_dir.glob("*_execution.json"):
                 agent_name = agent_file.stem.replace("_execution", "")
                 with open(agent_file, 'r', encoding='utf-8') as f:
                     details["agents"][agent_name] = json.load(f)
+            details["agents"].update(fold_agent_events(execution_dir / AGENT_EVENTS_FILE))
 
-        # 读取LLM交互信息
-        llm_dir = execution_dir / "llm_interactions"
-        if llm_dir.exists():
-            details["llm_interactions"] = []
-            for llm_file in llm_dir.glob("*.json"):
-                with open(llm_file, 'r', encoding='utf-8') as f:
-                    details["llm_interactions"].append(json.load(f))
+        # 读取LLM交互信息（未压缩目录或已归档的 llm_interactions.tar.zst）
+        if (execution_dir / "llm_interactions").exists() or (execution_dir / INTERACTIONS_ARCHIVE).exists():
+            details["llm_interactions"] = [
+                interaction for _, interaction in self._iter_interactions(execution_dir)]
 
         # 读取工具使用信息
         tools_dir = execution_dir / "tools"
@@ -117,6 +131,85 @@ class LogViewer:
 
         return details
 
+    def render_interaction_text(self, execution_id: str, interaction_id: str) -> Optional[str]:
+        """
+        生成一次LLM交互的纯文本版本（输入消息和输出内容），方便直接查看
+
+        Args:
+            execution_id: 执行ID
+            interaction_id: LLM交互ID（交互日志文件名末尾的8位ID）
+
+        Returns:
+            纯文本内容；未找到对应的交互日志时返回None
+        """
+        for file_name, interaction in self._iter_interactions(self.base_log_dir / execution_id):
+            if Path(file_name).stem.endswith(f"_{interaction_id}"):
+                return self._format_interaction_text(interaction)
+        return None
+
+    def materialize_interaction_texts(self, execution_id: str) -> int:
+        """
+        为一次执行的所有LLM交互生成同名的 .txt 纯文本文件
+
+        Returns:
+            生成的文件数量
+        """
+        count = 0
+        llm_dir = self.base_log_dir / execution_id / "llm_interactions"
+        for file_name, interaction in self._iter_interactions(self.base_log_dir / execution_id):
+            llm_dir.mkdir(exist_ok=True)
+            with open(llm_dir / Path(file_name).with_suffix(".txt").name, 'w', encoding='utf-8') as f:
+                f.write(self._format_interaction_text(interaction))
+            count += 1
+        return count
+
+    @staticmethod
+    def _decode_interaction(file_name: str, content: bytes) -> Optional[Dict[str, Any]]:
+        """按扩展名解码LLM交互日志（.json 或 .mpack），无法解码时返回None"""
+        if file_name.endswith(".json"):
+            return json.loads(content)
+        if file_name.endswith(".mpack"):
+            if msgpack is None:
+                print(f"⚠️ 需要安装 msgpack 才能读取: {file_name}")
+                return None
+            return msgpack.unpackb(content, raw=False)
+        return None
+
+    @classmethod
+    def _iter_interactions(cls, execution_dir: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """逐个读取LLM交互日志，返回 (文件名, 交互记录)，同时支持未压缩目录和 .tar.zst 归档"""
+        llm_dir = execution_dir / "llm_interactions"
+        if llm_dir.exists():
+            for llm_file in llm_dir.iterdir():
+                interaction = cls._decode_interaction(llm_file.name, llm_file.read_bytes())
+                if interaction is not None:
+                    yield llm_file.name, interaction
+
+        archive_path = execution_dir / INTERACTIONS_ARCHIVE
+        if not archive_path.exists():
+            return
+        if zstandard is None:
+            print(f"⚠️ 需要安装 zstandard 才能读取压缩归档: {archive_path}")
+            return
+        with open(archive_path, 'rb') as raw:
+            with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                with tarfile.open(fileobj=reader, mode='r|') as tar:
+                    for member in tar:
+                        if not member.isfile():
+                            continue
+                        file_name = Path(member.name).name
+                        interaction = cls._decode_interaction(file_name, tar.extractfile(member).read())
+                        if interaction is not None:
+                            yield file_name, interaction
+
+    @staticmethod
+    def _format_interaction_text(interaction: Dict[str, Any]) -> str:
+        """按 INPUT/OUTPUT 两段格式化LLM交互记录"""
+        messages = interaction.get('input', {}).get('messages', [])
+        output_content = interaction.get('output', {}).get('content', '')
+        return (f"=== INPUT MESSAGES ===\n{json.dumps(messages, ensure_ascii=False, indent=2)}\n\n"
+                f"=== OUTPUT CONTENT ===\n{output_content}")
+
     def print_execution_summary(self, execution_info: Dict[str, Any]):
         """打印执行摘要"""
         print(f"\n{'='*60}")
@@ -286,12 +379,22 @@ def main():
     parser.add_argument(
         "--summary-only", action="store_true", help="只显示摘要，不显示详细信息")
     parser.add_argument("--log-dir", type=str, default="logs", help="日志目录路径")
+    parser.add_argument("--interaction", "-i", type=str,
+                        help="与 --show 一起使用，输出该执行中指定LLM交互ID的纯文本内容")
+    parser.add_argument("--materialize-text", action="store_true",
+                        help="与 --show 一起使用，为该执行的所有LLM交互生成 .txt 纯文本文件")
 
     args = parser.parse_args()
 
     viewer = LogViewer(args.log_dir)
 
-    if args.show:
+    if args.show and args.interaction:
+        text = viewer.render_interaction_text(args.show, args.interaction)
+        print(text if text is not None else f"❌ 未找到LLM交互ID: {args.interaction}")
+    elif args.show and args.materialize_text:
+        count = viewer.materialize_interaction_texts(args.show)
+        print(f"✅ 已生成 {count} 个纯文本文件")
+    elif args.show:
         viewer.show_execution(args.show, not args.summary_only)
     elif args.list:
         viewer.show_recent_executions(args.limit)
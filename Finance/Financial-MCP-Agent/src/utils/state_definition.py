@@ -4,8 +4,18 @@ import operator
 
 
 def merge_dicts(d1: Dict[str, Any], d2: Dict[str, Any]) -> Dict[str, Any]:
-    """Merge two dictionaries, d2 values overwrite d1."""
-    return {**d1, **d2}
+    """Merge two dictionaries, d2 values overwrite d1.
+
+    When either side is empty (common at the start of a graph run) the other
+    dict is returned as is, without copying.
+    """
+    if not d1:
+        return d2
+    if not d2:
+        return d1
+    merged = d1.copy()
+    merged.update(d2)
+    return merged
 
 
 class AgentState(TypedDict):
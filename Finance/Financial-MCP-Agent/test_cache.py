@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存模块测试脚本
+验证MCP工具结果缓存、Agent分析结果缓存的过期、过期文件删除以及错误结果不缓存等行为，
+以及共享ChatOpenAI实例按配置和生成参数缓存
+"""
+
+import os
+import asyncio
+import tempfile
+
+from langchain_core.tools import StructuredTool
+
+from src.tools.cache import FileCache, wrap_tool_with_cache
+from src.utils.analysis_cache import AnalysisCache, make_cache_key
+from src.utils import llm_config
+
+
+def _report(title, checks):
+    """打印各项检查结果，有失败项时抛出AssertionError"""
+    print(f"\n🧪 {title}")
+    failed = 0
+    for name, ok in checks:
+        print(f"   {'✅ 通过' if ok else '❌ 失败'}: {name}")
+        failed += not ok
+    print(f"   📊 总测试数 {len(checks)}, 失败数量 {failed}")
+    assert failed == 0
+
+
+def test_file_cache():
+    """FileCache：未过期时命中，过期时返回None并删除缓存文件"""
+    cache = FileCache(tempfile.mkdtemp())
+    args = {"code": "sh.600519", "year": 2025}
+    cache.set("get_profit_data", args, {"roe": 0.3})
+    cache_path = cache._cache_path("get_profit_data", args)
+
+    fresh = cache.get("get_profit_data", args, ttl=60)
+    file_kept = os.path.exists(cache_path)
+    expired = cache.get("get_profit_data", args, ttl=-1)
+
+    _report("FileCache 过期与删除", [
+        ("未过期时返回缓存数据", fresh == {"roe": 0.3}),
+        ("命中时保留缓存文件", file_kept),
+        ("过期时返回None", expired is None),
+        ("过期的缓存文件被删除", not os.path.exists(cache_path)),
+        ("参数不同的查询不命中", cache.get("get_profit_data", {"code": "sz.000001"}, ttl=60) is None),
+    ])
+
+
+def test_wrap_tool_with_cache():
+    """wrap_tool_with_cache：以"Error"开头的结果不缓存，正常结果缓存后直接命中"""
+    results = ["Error: MCP server unavailable", "profit table"]
+    calls = []
+
+    async def _fake_profit_tool(code: str) -> str:
+        calls.append(code)
+        return results[len(calls) - 1]
+
+    tool = StructuredTool.from_function(
+        coroutine=_fake_profit_tool, name="get_profit_data", description="Fake profit tool.")
+    cache = FileCache(tempfile.mkdtemp())
+    cached_tool = wrap_tool_with_cache(tool, cache)
+
+    async def _run():
+        return [await cached_tool.ainvoke({"code": "sh.600519"}) for _ in range(3)]
+
+    outputs = asyncio.run(_run())
+    news_tool = StructuredTool.from_function(
+        coroutine=_fake_profit_tool, name="crawl_news", description="Fake news tool.")
+
+    _report("wrap_tool_with_cache 错误结果不缓存", [
+        ("第一次调用返回错误结果", outputs[0] == "Error: MCP server unavailable"),
+        ("错误结果未被缓存，第二次重新调用工具", outputs[1] == "profit table" and len(calls) == 2),
+        ("正常结果被缓存，第三次直接命中", outputs[2] == "profit table" and len(calls) == 2),
+        ("新闻类工具不包装缓存", wrap_tool_with_cache(news_tool, cache) is news_tool),
+    ])
+
+
+def test_analysis_cache():
+    """AnalysisCache：按写入时的TTL过期，过期时返回None并删除缓存文件，命名空间相互隔离"""
+    cache_dir = tempfile.mkdtemp()
+    cache = AnalysisCache("value_agent", cache_dir=cache_dir)
+    key = make_cache_key("sh.600519", "2026-10-14", "v2")
+
+    cache.set(key, "估值分析文本")
+    fresh = cache.get(key)
+    other_namespace = AnalysisCache("fundamental_agent", cache_dir=cache_dir).get(key)
+
+    cache.set(key, "估值分析文本", ttl=-1)
+    expired = cache.get(key)
+
+    _report("AnalysisCache 过期与删除", [
+        ("未过期时返回分析文本", fresh == "估值分析文本"),
+        ("不同命名空间互不命中", other_namespace is None),
+        ("提示词版本不同时缓存键不同", make_cache_key("sh.600519", "2026-10-14", "v3") != key),
+        ("过期时返回None", expired is None),
+        ("过期的缓存文件被删除", not os.path.exists(cache._cache_path(key))),
+    ])
+
+
+def test_chat_llm_cache():
+    """get_chat_llm：相同配置和参数复用同一实例，参数或配置变化时创建新实例"""
+    os.environ.update({
+        "OPENAI_COMPATIBLE_API_KEY": "test-key",
+        "OPENAI_COMPATIBLE_BASE_URL": "http://localhost:1/v1",
+        "OPENAI_COMPATIBLE_MODEL": "model-a",
+    })
+    llm_config.llm_cfg.cache_clear()
+    llm = llm_config.get_chat_llm(0.3, 6000)
+    same = llm_config.get_chat_llm(0.3, 6000)
+    other_params = llm_config.get_chat_llm(0.5, 5000)
+
+    os.environ["OPENAI_COMPATIBLE_MODEL"] = "model-b"
+    cached_cfg_llm = llm_config.get_chat_llm(0.3, 6000)
+    llm_config.llm_cfg.cache_clear()
+    new_cfg_llm = llm_config.get_chat_llm(0.3, 6000)
+
+    os.environ.pop("OPENAI_COMPATIBLE_MODEL")
+    llm_config.llm_cfg.cache_clear()
+    incomplete = not llm_config.llm_cfg().is_complete
+    llm_config.llm_cfg.cache_clear()
+
+    _report("get_chat_llm 实例缓存", [
+        ("使用配置中的模型和生成参数", llm.model_name == "model-a" and llm.temperature == 0.3 and llm.max_tokens == 6000),
+        ("相同参数复用同一实例", same is llm),
+        ("生成参数不同时创建新实例", other_params is not llm and other_params.max_tokens == 5000),
+        ("配置只读取一次，环境变量变化不影响已缓存的配置", cached_cfg_llm is llm),
+        ("重新读取配置后按新配置创建实例", new_cfg_llm is not llm and new_cfg_llm.model_name == "model-b"),
+        ("缺少环境变量时配置不完整", incomplete),
+    ])
+
+
+if __name__ == "__main__":
+    test_file_cache()
+    test_wrap_tool_with_cache()
+    test_analysis_cache()
+    test_chat_llm_cache()
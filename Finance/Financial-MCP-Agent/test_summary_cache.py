@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汇总报告缓存测试脚本
+验证报告在时间A生成并缓存后，在时间B命中缓存时报告正文完整、分析基准时间为时间B
+"""
+
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+from src.agents import summary_agent as sa
+from src.utils.analysis_cache import AnalysisCache
+from src.utils.execution_logger import initialize_execution_logger, flush_background_logs
+from src.utils.llm_config import LLMCfg
+
+TIME_A = "2026年10月14日 (2026-10-14) 星期三 10:00:00"
+TIME_B = "2026年10月14日 (2026-10-14) 星期三 15:30:00"
+
+RAW_REPORT = f"""```markdown
+# 贵州茅台（600519）综合分析报告
+
+分析日期：2026年10月14日
+
+## 投资建议
+基本面稳健，估值合理。
+
+分析基准时间：{TIME_A}
+这一行之后的内容应被截断
+```"""
+
+
+class _FakeLLM:
+    """返回固定报告的LLM，记录调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return SimpleNamespace(content=RAW_REPORT)
+
+
+async def _run_summary(current_time_info):
+    """以给定的当前时间运行一次汇总 Agent，返回最终报告"""
+    state = {"data": {
+        "query": "分析贵州茅台",
+        "stock_code": "600519",
+        "company_name": "贵州茅台",
+        "current_date": "2026-10-14",
+        "current_time_info": current_time_info,
+        "fundamental_analysis": "基本面分析内容",
+        "technical_analysis": "技术面分析内容",
+        "value_analysis": "估值分析内容",
+        "news_analysis": "新闻分析内容",
+    }, "messages": []}
+    result = await sa.summary_agent(state)
+    await flush_background_logs()
+    return result["data"]["final_report"]
+
+
+def test_summary_cache():
+    """在时间A生成并缓存报告，在时间B命中缓存"""
+    tmp_dir = tempfile.mkdtemp()
+    initialize_execution_logger(tmp_dir)
+    sa.summary_cache = AnalysisCache("summary_agent", cache_dir=tmp_dir)
+    sa.REPORTS_DIR = tmp_dir
+    sa.get_model_choice = lambda: "api"
+    sa.llm_cfg = lambda: LLMCfg(api_key="key", base_url="http://localhost", model="fake-model")
+    fake_llm = _FakeLLM()
+    sa.get_chat_llm = lambda temperature, max_tokens: fake_llm
+
+    report_a = asyncio.run(_run_summary(TIME_A))
+    report_b = asyncio.run(_run_summary(TIME_B))
+
+    checks = [
+        ("第二次运行命中缓存，未调用LLM", fake_llm.calls == 1),
+        ("时间A的报告在分析基准时间行截断", report_a.endswith(f"分析基准时间：{TIME_A}")),
+        ("时间B的报告正文完整", "## 投资建议" in report_b and "基本面稳健" in report_b),
+        ("时间B的报告分析基准时间为时间B", report_b.endswith(f"分析基准时间：{TIME_B}")),
+        ("时间B的报告不含时间A", TIME_A not in report_b),
+        ("时间B的报告与时间A仅时间不同", report_b == report_a.replace(TIME_A, TIME_B)),
+    ]
+
+    failed = 0
+    for name, ok in checks:
+        print(f"{'✅ 通过' if ok else '❌ 失败'}: {name}")
+        failed += not ok
+
+    print(f"\n📊 测试统计: 总测试数 {len(checks)}, 失败数量 {failed}")
+    assert failed == 0
+
+
+if __name__ == "__main__":
+    test_summary_cache()
@@ -4,9 +4,8 @@ from datetime import datetime
 
 from mcp.server.fastmcp import FastMCP
 
-# Import the interface and the concrete implementation
+# Import the interface; the concrete implementation is imported lazily (see _LazyDataSource)
 from src.data_source_interface import FinancialDataSource
-from src.baostock_data_source import BaostockDataSource
 from src.utils import setup_logging
 
 # 导入各模块工具的注册函数
@@ -26,8 +25,32 @@ setup_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Dependency Injection ---
+class _LazyDataSource:
+    """
+    数据源代理：首次调用数据接口时才导入并创建 BaostockDataSource
+
+    MCP客户端在初始化后立即请求工具列表，所有工具必须在 app.run() 之前注册；
+    而 baostock_data_source 模块及其依赖（requests、bs4等）只有真正调用工具时才需要，
+    推迟导入可以缩短服务器的启动时间。
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._source = None
+
+    def __getattr__(self, name):
+        if self._source is None:
+            self._source = self._factory()
+        return getattr(self._source, name)
+
+
+def _create_baostock_data_source() -> FinancialDataSource:
+    from src.baostock_data_source import BaostockDataSource
+    return BaostockDataSource()
+
+
 # Instantiate the data source - easy to swap later if needed
-active_data_source: FinancialDataSource = BaostockDataSource()
+active_data_source: FinancialDataSource = _LazyDataSource(_create_baostock_data_source)
 
 # --- Get current date for system prompt ---
 current_date = datetime.now().strftime("%Y-%m-%d")